@@ -0,0 +1,177 @@
+import argparse
+import os
+import sys
+import tempfile
+
+import ifcopenshell
+import ifcopenshell.guid
+
+from benchmarks.synthetic_model import generate_model, requirement_rows
+from ifc_validator.model_cache import index_model
+from ifc_validator.property_table import check_table
+from ifc_validator.requirements import CONSTRAINT_COLUMN
+from ifc_validator.rules import FIXED_ELEMENT_CHECKS, PROJECT_KEYS, PROJECT_PSET, compile_rules
+from ifc_validator.validation import check_elements
+
+# Strings that need every escape of the STEP encoding: quotes, backslashes,
+# \X\ (Latin-1), \X2\ (BMP) and \X4\ (beyond the BMP)
+ESCAPED_STRINGS = ["L'altezza", "C:\\percorsi\\muro", "Identità", "Ø 200 – ½", "日本語", "𝄞 chiave"]
+
+# Extraction modes compared against the 'relations' reference
+EXTRACTION_MODES = ['elements', 'step']
+
+# Requirements of the built models: missing, present and constrained pairs
+BUILT_REQUIREMENTS = {
+    'Muro': [
+        {'pset': "Identità", 'parameter': 'Spessore', 'constraint': "intervallo: 0..0,28"},
+        {'pset': "Dati tipo", 'parameter': 'Portante', 'constraint': "lista: True"},
+        {'pset': "Dati tipo", 'parameter': 'Strati', 'constraint': "intervallo: 1..2"},
+        {'pset': "Dati", 'parameter': 'Altezza', 'constraint': None},
+    ],
+    'Trave': [
+        {'pset': "Identità", 'parameter': 'Campate', 'constraint': "intervallo: 1.."},
+        {'pset': "Identità", 'parameter': 'Verificata', 'constraint': "lista: True"},
+        {'pset': "Testi", 'parameter': 'Testo0', 'constraint': "regex: L'.*"},
+    ],
+}
+
+# The fixed checks, with value constraints on some of the parameters
+FIXED_CHECKS = list(FIXED_ELEMENT_CHECKS) + [("Fase", "Condiviso", "lista: PD; PE"),
+                                             ("Lotto", "Condiviso", "intervallo: 2..")]
+
+
+def _value(ifc_file, value):
+    if isinstance(value, bool):
+        return ifc_file.create_entity('IfcBoolean', value)
+    if isinstance(value, int):
+        return ifc_file.create_entity('IfcInteger', value)
+    if isinstance(value, float):
+        return ifc_file.create_entity('IfcLengthMeasure', value)
+    return ifc_file.create_entity('IfcLabel', value)
+
+
+def _pset(ifc_file, name, properties):
+    return ifc_file.create_entity('IfcPropertySet', GlobalId=ifcopenshell.guid.new(), Name=name, HasProperties=[
+        ifc_file.create_entity('IfcPropertySingleValue', Name=prop_name,
+                               NominalValue=None if value is None else _value(ifc_file, value))
+        for prop_name, value in properties.items()
+    ])
+
+
+def _relate(ifc_file, pset, objects):
+    ifc_file.create_entity('IfcRelDefinesByProperties', GlobalId=ifcopenshell.guid.new(),
+                           RelatedObjects=objects, RelatingPropertyDefinition=pset)
+
+
+def build_model(schema):
+    """A small model with the property layouts the extractors have to agree on.
+
+    Type Psets inherited by occurrences (and overridden by them), a Pset
+    shared by several elements, a Pset name repeated on one element,
+    properties without a value, booleans, numbers and escaped strings.
+    """
+    ifc_file = ifcopenshell.file(schema=schema)
+    project = ifc_file.create_entity('IfcProject', GlobalId=ifcopenshell.guid.new(), Name="Cross check")
+    project_values = {key: f"{key} 1" for key in PROJECT_KEYS}
+    project_values['NomeModello'] = ESCAPED_STRINGS[0]
+    _relate(ifc_file, _pset(ifc_file, PROJECT_PSET, project_values), [project])
+
+    def element(ifc_class, name):
+        return ifc_file.create_entity(ifc_class, GlobalId=ifcopenshell.guid.new(), Name=name)
+
+    wall_type = ifc_file.create_entity('IfcWallType', GlobalId=ifcopenshell.guid.new(), Name="Tipo muro",
+                                       PredefinedType='STANDARD', HasPropertySets=[
+                                           _pset(ifc_file, "Identità", {'NomeOggetto': "Muro", 'Materiale': "CLS",
+                                                                        'Spessore': 0.3}),
+                                           _pset(ifc_file, "Dati tipo", {'Portante': True, 'Strati': 3}),
+                                       ])
+    typed_wall = element('IfcWall', "W1")
+    bare_wall = element('IfcWall', "W2")
+    beam = element('IfcBeam', "B1")
+    column = element('IfcColumn', "C1")
+    slab = element('IfcSlab', "S1")  # No Psets at all
+
+    _relate(ifc_file, _pset(ifc_file, "Identità", {'NomeOggetto': " Muro portante ", 'GUID': "G-0001",
+                                                   'Spessore': 0.25}), [typed_wall])
+    _relate(ifc_file, _pset(ifc_file, "Testi", {f"Testo{index}": text for index, text in enumerate(ESCAPED_STRINGS)}),
+            [beam])
+    _relate(ifc_file, _pset(ifc_file, "Identità", {'NomeOggetto': "Trave", 'GUID': "G-0003", 'Vuoto': None,
+                                                   'Verificata': False, 'Campate': 2}), [beam])
+    _relate(ifc_file, _pset(ifc_file, "Dati", {'Altezza': 3.0, 'Nota': "prima"}), [column])
+    _relate(ifc_file, _pset(ifc_file, "Dati", {'Nota': "seconda", 'Luce': 6.5}), [column])
+    _relate(ifc_file, _pset(ifc_file, "Solo vuoti", {'Vuoto': None}), [column])
+    _relate(ifc_file, _pset(ifc_file, "Condiviso", {'Fase': "PE", 'Lotto': 1}), [typed_wall, bare_wall, beam, column])
+    ifc_file.create_entity('IfcRelDefinesByType', GlobalId=ifcopenshell.guid.new(),
+                           RelatedObjects=[typed_wall, bare_wall], RelatingType=wall_type)
+    return ifc_file
+
+
+def canonical(value):
+    """A value with its dict order and the type of every leaf made explicit, for exact comparison."""
+    if isinstance(value, dict):
+        return [(key, canonical(item)) for key, item in value.items()]
+    if isinstance(value, (list, tuple)):
+        return [canonical(item) for item in value]
+    return type(value).__name__, value
+
+
+def synthetic_requirements():
+    """The requirements of generate_model()'s default classes, as load_requirements returns them."""
+    required_data = {}
+    for row in requirement_rows(20, 8):
+        required_data.setdefault(row['Elemento'], []).append({
+            'parameter': row['Parametri informativi'], 'pset': row['Pset_personalizzato'],
+            'constraint': row[CONSTRAINT_COLUMN]})
+    return required_data
+
+
+def compare_engines(model, rules):
+    """Keys of the check_elements() issue lists that check_table() gives differently."""
+    reference = check_elements(model['property_index'], rules)
+    table = check_table(model['property_index'], rules)
+    return [key for key in reference if canonical(list(table[key])) != canonical(list(reference[key]))]
+
+
+def compare_extraction(ifc_file_path):
+    """Names of the EXTRACTION_MODES whose index_model() differs from the 'relations' one."""
+    reference = canonical(index_model(ifc_file_path, 'relations'))
+    return [mode for mode in EXTRACTION_MODES if canonical(index_model(ifc_file_path, mode)) != reference]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Check that every extraction mode reads the same properties as the 'relations' mode, and "
+                    "that the 'table' check engine finds the same issues as the 'index' one "
+                    "(run from the repository root: python -m benchmarks.cross_check).")
+    parser.add_argument('ifc_files', nargs='*', help="also check these IFC files")
+    parser.add_argument('--elements', type=int, default=300, help="elements of the synthetic model")
+    args = parser.parse_args(argv)
+
+    failures = 0
+    with tempfile.TemporaryDirectory() as work_dir:
+        models = {f"built {schema}": build_model(schema) for schema in ('IFC2X3', 'IFC4')}
+        models[f"synthetic {args.elements}"] = generate_model(args.elements)
+        built_rules = compile_rules(BUILT_REQUIREMENTS, FIXED_CHECKS)
+        synthetic_rules = compile_rules(synthetic_requirements(), FIXED_CHECKS)
+        paths = []
+        for name, ifc_file in models.items():
+            path = os.path.join(work_dir, f"{name.replace(' ', '_')}.ifc")
+            ifc_file.write(path)
+            paths.append((name, path, synthetic_rules if name.startswith('synthetic') else built_rules))
+        paths += [(path, path, built_rules) for path in args.ifc_files]
+
+        for name, path, rules in paths:
+            differing = compare_extraction(path)
+            failures += len(differing)
+            print(f"{name:<40} extraction {'differs: ' + ', '.join(differing) if differing else 'same'}")
+            differing = compare_engines(index_model(path, 'relations'), rules)
+            failures += len(differing)
+            print(f"{name:<40} engines {'differ: ' + ', '.join(differing) if differing else 'same'}")
+
+    if failures:
+        sys.exit(f"{failures} mismatches")
+    print("All checks passed")
+
+
+if __name__ == '__main__':
+    main()
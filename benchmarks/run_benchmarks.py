@@ -0,0 +1,139 @@
+import argparse
+import json
+import os
+import platform
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import ifcopenshell
+
+from benchmarks.synthetic_model import generate_model, write_requirements
+from ifc_validator.metrics import peak_rss_mb
+from ifc_validator.property_index import build_property_index, extract_project_psets
+from ifc_validator.property_table import check_table
+from ifc_validator.reports import REPORT_SHEETS, save_report
+from ifc_validator.requirements import load_requirements
+from ifc_validator.rules import compile_rules
+from ifc_validator.step_extract import index_step_file
+from ifc_validator.validation import check_elements, check_project, check_project_values
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+
+
+def model_paths(work_dir, size, seed):
+    stem = os.path.join(work_dir, f"synthetic_{size}_{seed}")
+    return f"{stem}.ifc", f"{stem}_requirements.xlsx"
+
+
+def ensure_model(work_dir, size, options):
+    """Generate the synthetic model and workbook of a size unless they already exist."""
+    ifc_file_path, excel_file = model_paths(work_dir, size, options['seed'])
+    if not os.path.exists(ifc_file_path):
+        print(f"Generating {size} elements: {ifc_file_path}")
+        generate_model(size, **options).write(ifc_file_path)
+    if not os.path.exists(excel_file):
+        write_requirements(excel_file, options['classes'], options['parameters_per_class'])
+    return ifc_file_path, excel_file
+
+
+def run_size(ifc_file_path, excel_file, report_dir):
+    """Time every stage on one model; runs in its own process so peak RSS is per model."""
+    stages = []
+
+    def stage(name, function, *args, **kwargs):
+        start = time.perf_counter()
+        result = function(*args, **kwargs)
+        stages.append({'stage': name, 'seconds': round(time.perf_counter() - start, 4),
+                       'peak_rss_mb': peak_rss_mb()})
+        return result
+
+    rules = stage('requirements', lambda: compile_rules(load_requirements(excel_file, cache_dir=None)))
+    ifc_file = stage('open', ifcopenshell.open, ifc_file_path)
+    elements = ifc_file.by_type("IfcElement")
+    stage('extract (elements)', build_property_index, ifc_file, elements, mode='elements')
+    property_index = stage('extract (relations)', build_property_index, ifc_file, elements, mode='relations')
+    project_psets = stage('extract (project)', extract_project_psets, ifc_file)
+    # Peak RSS is cumulative, so this stage shows the time of the STEP scan, not its memory
+    stage('extract (step, no open)', index_step_file, ifc_file_path)
+    project_level_issues = stage('check project (STEP 4b)', check_project, project_psets)
+    project_value_issues = stage('check project values (STEP 4f)', check_project_values, project_psets, rules)
+    checked = stage('check elements (STEP 4-4f, index)', check_elements, property_index, rules)
+    stage('check elements (STEP 4-4f, table)', check_table, property_index, rules)
+
+    results = {
+        'element_count': len(elements),
+        'missing_report': checked['required'] + checked['fixed'],
+        'project_level_issues': project_level_issues,
+        'unexpected_report': checked['unexpected_report'],
+        'unexpected_pset_report': checked['unexpected_pset_report'],
+        'invalid_value_report': checked['invalid_value_report'],
+        'project_value_issues': project_value_issues,
+    }
+    for extension in ('xlsx', 'parquet'):
+        report = os.path.join(report_dir, f"{os.path.basename(ifc_file_path)}.report.{extension}")
+        stage(f'report write ({extension})', save_report, results, report, ifc_file_path)
+
+    return {
+        'elements': len(elements),
+        'issues': {key: len(results[key]) for key, _ in REPORT_SHEETS},
+        'stages': stages,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Benchmark the validation stages on synthetic models (run from the repository root: "
+                    "python -m benchmarks.run_benchmarks).")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help="elements per model")
+    parser.add_argument('--work-dir', default="bench_models", help="where models and reports are kept")
+    parser.add_argument('--output', default="bench_results.jsonl", help="results are appended here")
+    parser.add_argument('--classes', type=int, default=20)
+    parser.add_argument('--parameters-per-class', type=int, default=8)
+    parser.add_argument('--shared-share', type=float, default=0.5)
+    parser.add_argument('--missing-rate', type=float, default=0.02)
+    parser.add_argument('--unexpected-rate', type=float, default=0.02)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    options = {
+        'classes': args.classes,
+        'parameters_per_class': args.parameters_per_class,
+        'shared_share': args.shared_share,
+        'missing_rate': args.missing_rate,
+        'unexpected_rate': args.unexpected_rate,
+        'seed': args.seed,
+    }
+    os.makedirs(args.work_dir, exist_ok=True)
+
+    for size in args.sizes:
+        ifc_file_path, excel_file = ensure_model(args.work_dir, size, options)
+        # A fresh process per model keeps the peak RSS of one size from hiding the next
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as executor:
+            measured = executor.submit(run_size, ifc_file_path, excel_file, args.work_dir).result()
+
+        record = {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'ifcopenshell': ifcopenshell.version,
+            'ifc_file': ifc_file_path,
+            'file_mb': round(os.path.getsize(ifc_file_path) / (1024 * 1024), 1),
+            'options': options,
+            **measured,
+        }
+        with open(args.output, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record) + '\n')
+
+        print(f"\n=== {size} elements ({record['file_mb']} MB) ===")
+        for stage in measured['stages']:
+            print(f"{stage['stage']:<40} {stage['seconds']:>10.3f} s   peak RSS {stage['peak_rss_mb'] or 0:>8.1f} MB")
+        seconds = {stage['stage']: stage['seconds'] for stage in measured['stages']}
+        index_seconds = seconds['check elements (STEP 4-4f, index)']
+        table_seconds = seconds['check elements (STEP 4-4f, table)']
+        print(f"The table engine takes {table_seconds / index_seconds:.2f}x the time of the index engine "
+              f"({'faster' if table_seconds < index_seconds else 'slower'} at this size)")
+    print(f"\nResults appended to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,154 @@
+import argparse
+import random
+
+import ifcopenshell
+import ifcopenshell.api
+import ifcopenshell.guid
+
+from ifc_validator.requirements import CONSTRAINT_COLUMN
+from ifc_validator.rules import FIXED_ELEMENT_CHECKS, PROJECT_KEYS, PROJECT_PSET
+
+# Element classes the synthetic NomeOggetto classes are spread over
+IFC_CLASSES = ['IfcWall', 'IfcBeam', 'IfcColumn', 'IfcSlab', 'IfcFooting', 'IfcMember', 'IfcPlate']
+
+# Pset holding the Excel-required parameters of every class
+CLASS_PSET = "Dati tecnici"
+
+# Unexpected Pset and parameter added to a share of the elements
+EXTRA_PSET = "Pset_NonRichiesto"
+EXTRA_PARAMETER = "ParametroNonRichiesto"
+
+
+def class_parameters(class_index, parameters_per_class):
+    """Excel-required parameters of NomeOggetto class number `class_index`."""
+    # Overlapping windows over a shared vocabulary, like real object classes
+    return [f"Parametro{class_index + offset:03d}" for offset in range(parameters_per_class)]
+
+
+def requirement_rows(classes, parameters_per_class):
+    """Rows of the synthetic requirements workbook matching generate_model().
+
+    Every parameter carries a range constraint its generated values satisfy.
+    """
+    return [{'Elemento': f"Classe{class_index:03d}", 'Parametri informativi': parameter,
+             'Pset_personalizzato': CLASS_PSET, CONSTRAINT_COLUMN: f"intervallo: 0..{parameters_per_class}"}
+            for class_index in range(classes)
+            for parameter in class_parameters(class_index, parameters_per_class)]
+
+
+def write_requirements(path, classes=20, parameters_per_class=8):
+    """Write the synthetic requirements sheet as .xlsx, .csv or .parquet."""
+    import pandas as pd
+
+    df = pd.DataFrame(requirement_rows(classes, parameters_per_class))
+    if path.endswith('.csv'):
+        df.to_csv(path, index=False)
+    elif path.endswith('.parquet'):
+        df.to_parquet(path, index=False)
+    else:
+        df.to_excel(path, index=False)
+
+
+def _pset(ifc_file, name, properties):
+    return ifc_file.create_entity('IfcPropertySet', GlobalId=ifcopenshell.guid.new(), Name=name, HasProperties=[
+        ifc_file.create_entity('IfcPropertySingleValue', Name=prop_name, NominalValue=ifc_file.create_entity(
+            'IfcReal' if isinstance(value, float) else 'IfcLabel', value))
+        for prop_name, value in properties.items()
+    ])
+
+
+def _relate(ifc_file, pset, objects):
+    ifc_file.create_entity('IfcRelDefinesByProperties', GlobalId=ifcopenshell.guid.new(),
+                           RelatedObjects=objects, RelatingPropertyDefinition=pset)
+
+
+def _drop(properties, rng, rate):
+    # Omit each property with probability `rate`
+    return {name: value for name, value in properties.items() if rng.random() >= rate}
+
+
+def generate_model(elements=1000, classes=20, parameters_per_class=8, shared_share=0.5,
+                   missing_rate=0.02, unexpected_rate=0.02, seed=0):
+    """Build a synthetic IFC4 model with the property layout the validators check.
+
+    Every element gets a NomeOggetto class (Classe000, ...), a per-element
+    "Identità" Pset with the fixed parameters and a CLASS_PSET with the
+    Excel-required parameters of its class. A `shared_share` of the elements
+    reference one CLASS_PSET instance per class instead of their own, and the
+    cost/time Psets are shared by all elements. Each property is left out
+    with probability `missing_rate`, and an unexpected parameter and Pset are
+    added with probability `unexpected_rate`.
+    """
+    rng = random.Random(seed)
+    ifc_file = ifcopenshell.api.run("project.create_file", version="IFC4")
+    project = ifcopenshell.api.run("root.create_entity", ifc_file, ifc_class="IfcProject", name="Synthetic")
+    project_values = {key: f"{key} 1" for key in PROJECT_KEYS}
+    project_values['DataRevisione'] = "2024-01-01"
+    _relate(ifc_file, _pset(ifc_file, PROJECT_PSET, project_values), [project])
+
+    identity_parameters = [param for param, pset, *_ in FIXED_ELEMENT_CHECKS if pset == "Identità"]
+    other_fixed = {}
+    for param, pset, *_ in FIXED_ELEMENT_CHECKS:
+        if pset != "Identità":
+            other_fixed.setdefault(pset, {})[param] = f"{param} 1"
+
+    shared_class_psets = {}
+    shared_members = {}
+    all_elements = []
+    for index in range(elements):
+        class_index = index % classes
+        element = ifc_file.create_entity(rng.choice(IFC_CLASSES), GlobalId=ifcopenshell.guid.new(),
+                                         Name=f"E{index}")
+        all_elements.append(element)
+
+        identity = {param: f"{param} {index}" for param in identity_parameters}
+        identity = _drop(identity, rng, missing_rate)
+        identity['NomeOggetto'] = f"Classe{class_index:03d}"
+        identity['GUID'] = f"GUID-{index:08d}"
+        _relate(ifc_file, _pset(ifc_file, "Identità", identity), [element])
+
+        class_properties = {param: float(position)
+                            for position, param in enumerate(class_parameters(class_index, parameters_per_class))}
+        if rng.random() < shared_share:
+            if class_index not in shared_class_psets:
+                shared_class_psets[class_index] = _pset(ifc_file, CLASS_PSET,
+                                                        _drop(class_properties, rng, missing_rate))
+            shared_members.setdefault(class_index, []).append(element)
+        else:
+            properties = _drop(class_properties, rng, missing_rate)
+            if rng.random() < unexpected_rate:
+                properties[EXTRA_PARAMETER] = "extra"
+            if properties:
+                _relate(ifc_file, _pset(ifc_file, CLASS_PSET, properties), [element])
+
+        if rng.random() < unexpected_rate:
+            _relate(ifc_file, _pset(ifc_file, EXTRA_PSET, {EXTRA_PARAMETER: "extra"}), [element])
+
+    for class_index, members in shared_members.items():
+        _relate(ifc_file, shared_class_psets[class_index], members)
+    for pset_name, properties in other_fixed.items():
+        if all_elements:
+            _relate(ifc_file, _pset(ifc_file, pset_name, properties), all_elements)
+    return ifc_file
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write a synthetic IFC model and its requirements workbook.")
+    parser.add_argument('ifc_file')
+    parser.add_argument('excel_file')
+    parser.add_argument('-n', '--elements', type=int, default=1000)
+    parser.add_argument('--classes', type=int, default=20, help="NomeOggetto classes")
+    parser.add_argument('--parameters-per-class', type=int, default=8)
+    parser.add_argument('--shared-share', type=float, default=0.5, help="share of elements using shared Psets")
+    parser.add_argument('--missing-rate', type=float, default=0.02)
+    parser.add_argument('--unexpected-rate', type=float, default=0.02)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    generate_model(args.elements, args.classes, args.parameters_per_class, args.shared_share,
+                   args.missing_rate, args.unexpected_rate, args.seed).write(args.ifc_file)
+    write_requirements(args.excel_file, args.classes, args.parameters_per_class)
+
+
+if __name__ == '__main__':
+    main()
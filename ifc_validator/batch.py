@@ -0,0 +1,121 @@
+import glob
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from .metrics import Metrics
+from .reports import REPORT_SHEETS, SUMMARY_COLUMNS, summarize, write_sheets
+from .requirements import load_requirements
+from .rules import compile_rules
+from .validation import validate_model
+
+# Set in each worker process by _init_worker
+_rules = None
+_extraction_mode = None
+_cache_dir = None
+
+
+def find_ifc_files(pattern):
+    """Return the sorted IFC files in a directory, or matching a glob pattern."""
+    if os.path.isdir(pattern):
+        paths = [os.path.join(pattern, name) for name in os.listdir(pattern)
+                 if name.lower().endswith('.ifc')]
+    else:
+        paths = glob.glob(pattern, recursive=True)
+    return sorted(paths)
+
+
+def _init_worker(rules, extraction_mode, cache_dir):
+    # The compiled rules are sent once per worker rather than once per file
+    global _rules, _extraction_mode, _cache_dir
+    _rules = rules
+    _extraction_mode = extraction_mode
+    _cache_dir = cache_dir
+
+
+def _validate_file(ifc_file_path):
+    metrics = Metrics()
+    results = validate_model(ifc_file_path, _rules, extraction_mode=_extraction_mode, cache_dir=_cache_dir,
+                             metrics=metrics)
+    results['metrics'] = metrics.to_dict()
+    return results
+
+
+def validate_files(ifc_file_paths, rules, max_workers=None, extraction_mode='relations', cache_dir=None):
+    """Validate the files across a process pool.
+
+    Returns {path: results} in the order of `ifc_file_paths`, plus
+    {path: error message} for the files that could not be validated. Each
+    results dict carries the file's stage metrics under 'metrics'.
+    """
+    results = {}
+    failures = {}
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                             initargs=(rules, extraction_mode, cache_dir)) as executor:
+        futures = {executor.submit(_validate_file, path): path for path in ifc_file_paths}
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                results[path] = future.result()
+            except Exception as exc:
+                failures[path] = f"{type(exc).__name__}: {exc}"
+            print(f"[{len(results) + len(failures)}/{len(futures)}] {path}")
+
+    ordered = {path: results[path] for path in ifc_file_paths if path in results}
+    return ordered, failures
+
+
+def save_batch_report(results_by_file, failures, report_filename):
+    """Write one report with a per-file summary and the issues of all files.
+
+    The "Summary by Parameter" sheet has the reports.summarize groups of
+    every file. The format follows the file extension, see
+    reports.write_sheets.
+    """
+    summary = ({
+        'IFC File': path,
+        'Elements': results['element_count'],
+        **{sheet_name: len(results[key]) for key, sheet_name in REPORT_SHEETS},
+    } for path, results in results_by_file.items())
+    sheets = [
+        ("Files", summary),
+        ("Failed Files", ({'IFC File': path, 'Error': error} for path, error in failures.items())),
+        ("Summary by Parameter", ({'IFC File': path, **group} for path, results in results_by_file.items()
+                                  for group in summarize(results)['groups']), ['IFC File'] + SUMMARY_COLUMNS),
+    ]
+    sheets += [(sheet_name, _issue_rows(results_by_file, key)) for key, sheet_name in REPORT_SHEETS]
+    write_sheets(report_filename, sheets)
+
+
+def _issue_rows(results_by_file, key):
+    # A function rather than an inline generator, which would see only the last `key`
+    for path, results in results_by_file.items():
+        for issue in results[key]:
+            yield {'IFC File': path, **issue}
+
+
+def save_batch_metrics(results_by_file, metrics_filename):
+    """Append the stage metrics of every file to a JSON Lines file, one line per file."""
+    with open(metrics_filename, 'a', encoding='utf-8') as f:
+        for path, results in results_by_file.items():
+            f.write(json.dumps({'ifc_file': path, **results['metrics']}) + '\n')
+
+
+def run(args):
+    """The `batch` command; see cli.py for its arguments."""
+    ifc_file_paths = find_ifc_files(args.ifc_files)
+    if not ifc_file_paths:
+        raise SystemExit(f"error: no IFC files found for {args.ifc_files}")
+
+    rules = compile_rules(load_requirements(args.excel_file))
+    print(f"Validating {len(ifc_file_paths)} IFC files")
+    results_by_file, failures = validate_files(ifc_file_paths, rules, max_workers=args.jobs,
+                                               extraction_mode=args.extraction_mode, cache_dir=args.cache_dir)
+
+    save_batch_report(results_by_file, failures, args.output)
+    if args.metrics:
+        save_batch_metrics(results_by_file, args.metrics)
+    if failures:
+        print(f"❌ {len(failures)} files could not be validated, see the 'Failed Files' sheet")
+    print(f"\nReport saved to {args.output}")
+
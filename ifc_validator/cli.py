@@ -0,0 +1,203 @@
+import argparse
+
+# Only argparse is imported up front: each command imports what it needs, so
+# `--help` and console-only runs do not pay for pandas, openpyxl or pyarrow.
+
+REPORT_HELP = "report file; .xlsx, .csv, .jsonl or .parquet"
+WORKBOOK_HELP = "requirements workbook (.xlsx, or a .csv/.parquet export of the sheet)"
+EXTRACTION_HELP = "'step' reads the properties straight from the file text, without loading the geometry"
+NOME_OGGETTO_HELP = "only elements with this NomeOggetto"
+GUID_HELP = "only the element with this GUID property"
+
+
+def _report_file(path):
+    # argparse type of the -o options: reject an unsupported extension before any work
+    from .reports import report_format
+    try:
+        report_format(path)
+    except ValueError as exc:
+        raise argparse.ArgumentTypeError(str(exc))
+    return path
+
+
+def validate(ifc_file_path, excel_file, report_filename=None, extraction_mode='relations', workers=1,
+             cache_dir=None, engine='index', print_issues=False, unexpected=True, metrics_file=None,
+             profile_file=None, nome_oggetti=None, guids=None, summary_file=None):
+    """Validate one IFC file: STEP 1 to 6 of the original scripts.
+
+    unexpected=False leaves out the unexpected parameter and Pset checks,
+    like app1.py. The console shows the issue counts per check and per
+    NomeOggetto/Pset/parameter (see reports.summarize); print_issues=True
+    lists every issue instead. The report is only written when
+    report_filename is given, the summary JSON when summary_file is.
+    nome_oggetti and guids re-check only the matching elements; with a
+    cache_dir they are found through the cache's lookup indexes.
+    """
+    from .metrics import Metrics, start_profile
+    from .reports import REPORT_SHEETS, print_report, report_format, save_report, save_summary, summarize
+    from .requirements import load_requirements
+    from .rules import compile_rules
+    from .validation import validate_model
+
+    if report_filename is not None:
+        report_format(report_filename)  # An unsupported extension fails now, not after the checks
+
+    metrics = Metrics()
+    stop_profile = start_profile(profile_file)
+
+    # === STEP 1: Read Excel and Build Requirement Mapping ===
+    with metrics.stage('STEP 1') as counters:
+        rules = compile_rules(load_requirements(excel_file))
+        counters['object_classes'] = len(rules.objects)
+
+    # === STEP 3 to 4e: Load IFC File and Validate Each Element ===
+    print(f"Opening IFC file: {ifc_file_path}")
+    results = validate_model(ifc_file_path, rules, extraction_mode=extraction_mode, workers=workers,
+                             cache_dir=cache_dir, engine=engine, metrics=metrics, nome_oggetti=nome_oggetti,
+                             guids=guids)
+    if not unexpected:
+        del results['unexpected_report'], results['unexpected_pset_report']
+
+    print(f"Total elements found: {results['element_count']}")
+
+    # === STEP 5: Report Results ===
+    with metrics.stage('STEP 5 summary') as counters:
+        summary = summarize(results)
+        counters['groups'] = len(summary['groups'])
+    with metrics.stage('STEP 5'):
+        print_report(results, detail=print_issues, summary=summary)
+    if summary_file is not None:
+        save_summary(summary, summary_file)
+        print(f"\nSummary saved to {summary_file}")
+
+    # === STEP 6: Save Report ===
+    if report_filename is not None:
+        with metrics.stage('STEP 6') as counters:
+            save_report(results, report_filename, ifc_file_path, summary=summary)
+            counters['issues'] = sum(len(results[key]) for key, _ in REPORT_SHEETS if key in results)
+
+        print(f"\nReport saved to {report_filename}")
+
+    stop_profile()
+    if metrics_file is not None:
+        metrics.save(metrics_file)
+        print(f"Metrics saved to {metrics_file}")
+    return results
+
+
+def _validate(args):
+    validate(args.ifc_file, args.excel_file, report_filename=args.output, extraction_mode=args.extraction_mode,
+             workers=args.workers, cache_dir=args.cache_dir, engine=args.engine, print_issues=args.details,
+             unexpected=not args.no_unexpected, metrics_file=args.metrics, profile_file=args.profile,
+             nome_oggetti=args.nome_oggetti, guids=args.guids, summary_file=args.summary_json)
+
+
+def _dump(args):
+    from .dump import run
+    run(args)
+
+
+def _batch(args):
+    from .batch import run
+    run(args)
+
+
+def _revalidate(args):
+    from .incremental import run
+    run(args)
+
+
+def _serve(args):
+    from .service import run
+    run(args)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m ifc_validator",
+                                     description="Check IFC models against a requirements workbook.")
+    commands = parser.add_subparsers(dest='command', required=True, metavar='command')
+
+    command = commands.add_parser('validate', help="validate one IFC file",
+                                  description="Validate one IFC file and print the issues.")
+    command.add_argument('ifc_file')
+    command.add_argument('excel_file', help=WORKBOOK_HELP)
+    command.add_argument('-o', '--output', type=_report_file, default=None, help=f"{REPORT_HELP} (default: console only)")
+    command.add_argument('--details', action='store_true',
+                         help="print every issue instead of the counts per check and NomeOggetto/Pset/parameter")
+    command.add_argument('--summary-json', default=None, help="also save the summary counts as JSON")
+    command.add_argument('--no-unexpected', action='store_true',
+                         help="skip the unexpected parameter and Pset checks (the app1.py report)")
+    command.add_argument('--extraction-mode', choices=['relations', 'elements', 'step'], default='relations',
+                         help=EXTRACTION_HELP)
+    command.add_argument('-j', '--workers', type=int, default=1,
+                         help="shard the element checks across forked worker processes (ignored with --cache-dir)")
+    command.add_argument('--cache-dir', default=None, help="skip parsing unchanged IFC files on later runs")
+    command.add_argument('--nome-oggetto', dest='nome_oggetti', action='append', metavar='VALUE',
+                         help=NOME_OGGETTO_HELP)
+    command.add_argument('--guid', dest='guids', action='append', metavar='VALUE', help=GUID_HELP)
+    command.add_argument('--engine', choices=['index', 'table'], default='index',
+                         help="'table' runs pandas anti-joins over a property table; slower than 'index', "
+                              "meant for cross-checks")
+    command.add_argument('--metrics', default=None, help="save the time, CPU, memory and counters of each step")
+    command.add_argument('--profile', default=None, help="save a cProfile dump of the run")
+    command.set_defaults(run=_validate)
+
+    command = commands.add_parser('dump', help="print or export the Psets of every element",
+                                  description="Print the NomeOggetto and Psets of every element, or stream "
+                                              "one row per property into a file. Filters can be repeated.")
+    command.add_argument('ifc_file')
+    command.add_argument('-o', '--output', type=_report_file, default=None,
+                         help="write one row per property to a .jsonl, .csv, .parquet or .xlsx file")
+    command.add_argument('--type', dest='ifc_types', action='append', metavar='IFC_CLASS',
+                         help="only elements of this class, e.g. IfcWall (default: every IfcElement)")
+    command.add_argument('--nome-oggetto', dest='nome_oggetti', action='append', metavar='VALUE',
+                         help=NOME_OGGETTO_HELP)
+    command.add_argument('--guid', dest='guids', action='append', metavar='VALUE', help=GUID_HELP)
+    command.add_argument('--pset', dest='pset_names', action='append', metavar='NAME', help="only this Pset")
+    command.add_argument('--property', dest='property_names', action='append', metavar='NAME',
+                         help="only this property")
+    command.add_argument('--cache-dir', default=None,
+                         help="find the --nome-oggetto/--guid elements through the model cache's lookup index")
+    command.set_defaults(run=_dump)
+
+    command = commands.add_parser('batch', help="validate many IFC files in parallel",
+                                  description="Validate many IFC files in parallel into one report.")
+    command.add_argument('ifc_files', help="directory of .ifc files or glob pattern (quote it)")
+    command.add_argument('excel_file', help=WORKBOOK_HELP)
+    command.add_argument('-o', '--output', type=_report_file, default="validation_report_batch.xlsx", help=REPORT_HELP)
+    command.add_argument('-j', '--jobs', type=int, default=None, help="worker processes (default: CPU count)")
+    command.add_argument('--extraction-mode', choices=['relations', 'elements', 'step'], default='relations',
+                         help=EXTRACTION_HELP)
+    command.add_argument('--cache-dir', default=None, help="reuse the extracted properties of unchanged files")
+    command.add_argument('--metrics', default=None, help="append per-file stage metrics to this .jsonl file")
+    command.set_defaults(run=_batch)
+
+    command = commands.add_parser('revalidate', help="re-check only the elements changed since the last run",
+                                  description="Re-validate a new revision of an IFC model, re-checking only "
+                                              "changed elements.")
+    command.add_argument('ifc_file', help="current revision of the model")
+    command.add_argument('excel_file', help=WORKBOOK_HELP)
+    command.add_argument('--state', required=True,
+                         help="state file of the previous revision; rewritten for the current one")
+    command.add_argument('--previous-ifc', default=None,
+                         help="previous revision, used to build the state when the state file does not exist yet")
+    command.add_argument('--cache-dir', default=None, help="model cache (default: ~/.cache/ifc_validator)")
+    command.add_argument('-o', '--output', type=_report_file, default="validation_report_delta.xlsx", help=REPORT_HELP)
+    command.set_defaults(run=_revalidate)
+
+    command = commands.add_parser('serve', help="serve the checks over HTTP with warm model caches",
+                                  description="Serve the validate checks over HTTP with warm model caches.")
+    command.add_argument('--host', default='127.0.0.1')
+    command.add_argument('--port', type=int, default=None, help="default: 8765")
+    command.add_argument('--unix-socket', default=None, help="listen on this Unix socket instead of a TCP port")
+    command.add_argument('--memory-budget-mb', type=int, default=None,
+                         help="memory for cached models and requirement sets (default: 1024)")
+    command.add_argument('-j', '--jobs', type=int, default=None, help="concurrent validations (default: CPU count)")
+    command.add_argument('--cache-dir', default=None, help="also keep extracted models in this on-disk cache")
+    command.set_defaults(run=_serve)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    args.run(args)
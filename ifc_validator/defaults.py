@@ -0,0 +1,6 @@
+import os
+
+# Where the model and requirements caches live unless a cache_dir is given.
+# Kept apart from model_cache so that loading a workbook does not import
+# ifcopenshell and sqlite3.
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "ifc_validator")
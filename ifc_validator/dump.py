@@ -0,0 +1,154 @@
+import ifcopenshell
+
+from . import model_cache
+from .property_index import decode_cached, index_element, property_sets
+from .reports import write_table
+
+# Columns of the file output, one row per property
+DUMP_COLUMNS = ['Element ID', 'IFC Type', 'GlobalId', 'NomeOggetto', 'Pset', 'Property', 'Value']
+
+
+def _elements(ifc_file, ifc_types, element_ids=None):
+    # by_type narrows the traversal to the requested classes and their subclasses
+    if not ifc_types:
+        if element_ids is not None:
+            yield from (ifc_file.by_id(element_id) for element_id in element_ids)
+        else:
+            yield from ifc_file.by_type('IfcElement')
+        return
+    seen = set()
+    for ifc_type in ifc_types:
+        for element in ifc_file.by_type(ifc_type):
+            if element_ids is not None and element.id() not in element_ids:
+                continue
+            if element.id() not in seen:  # e.g. IfcWall and IfcWallStandardCase both given
+                seen.add(element.id())
+                yield element
+
+
+def iter_element_psets(ifc_file, ifc_types=None, nome_oggetti=None, guids=None, pset_names=None,
+                       property_names=None, element_ids=None):
+    """Yield (element, NomeOggetto, [(pset name, {prop: value}), ...]) for each matching element.
+
+    Elements are visited lazily in by_type order, so output can be streamed
+    and the traversal stopped at any point. The filters are collections of
+    accepted values (None accepts everything) and are applied during the
+    traversal:
+      ifc_types       only these classes (and their subclasses) are visited
+      nome_oggetti    elements whose NomeOggetto is not one of these are dropped
+      guids           likewise for the GUID property
+      pset_names      other Psets are left out
+      property_names  other properties are left out, and so are Psets left empty
+    NomeOggetto and GUID are resolved like the validation does, by
+    property_index.index_element: the first ones in the element's Psets,
+    then in its type's, with NomeOggetto stripped. The Psets listed are the
+    element's own. element_ids (ids in by_type("IfcElement") order, e.g.
+    from a model_cache lookup) limits the visit to those elements instead
+    of the whole model; the filters still apply.
+    """
+    if element_ids is not None and ifc_types:
+        element_ids = set(element_ids)
+    decoded = {}  # Psets shared by several elements are decoded once
+    for element in _elements(ifc_file, ifc_types, element_ids):
+        record = index_element(element, decoded)
+        if nome_oggetti is not None and record['nome_oggetto'] not in nome_oggetti:
+            continue
+        if guids is not None and record['guid'] not in guids:
+            continue
+
+        psets = []
+        for prop_set in property_sets(element):
+            if pset_names is not None and prop_set.Name not in pset_names:
+                continue
+            props = decode_cached(prop_set, decoded)[0]
+            if property_names is not None:
+                props = {name: value for name, value in props.items() if name in property_names}
+                if not props:
+                    continue
+            psets.append((prop_set.Name, props))
+        yield element, record['nome_oggetto'], psets
+
+
+def iter_property_rows(ifc_file, **filters):
+    """Yield one DUMP_COLUMNS row per property of the elements matching `filters` (see iter_element_psets)."""
+    for element, nome_oggetto, psets in iter_element_psets(ifc_file, **filters):
+        for pset_name, props in psets:
+            for prop_name, value in props.items():
+                yield {
+                    'Element ID': element.id(),
+                    'IFC Type': element.is_a(),
+                    'GlobalId': element.GlobalId,
+                    'NomeOggetto': nome_oggetto,
+                    'Pset': pset_name,
+                    'Property': prop_name,
+                    'Value': value,
+                }
+
+
+# Function to print Psets for elements
+def print_psets_for_elements(ifc_file, **filters):
+    for element, nome_oggetto, psets in iter_element_psets(ifc_file, **filters):
+        # Print element information
+        print(f"Element ID: {element.id()}, NomeOggetto: {nome_oggetto if nome_oggetto else 'Not found'}")
+
+        if psets:
+            for pset_name, props in psets:
+                print(f"  Pset: {pset_name}")
+                for prop_name, value in props.items():
+                    print(f"    Property Name: {prop_name}, Value: {value}")
+        else:
+            print("  No Psets found for this element.")
+        print("\n" + "-"*50 + "\n")
+
+
+def dump_properties(ifc_file, path, output_format=None, **filters):
+    """Stream the properties of the matching elements into a .jsonl, .csv, .parquet or .xlsx file.
+
+    Rows are written as the traversal produces them. Returns the number of
+    rows written; nothing is written when no property matches.
+    """
+    written = 0
+
+    def counted():
+        nonlocal written
+        for row in iter_property_rows(ifc_file, **filters):
+            written += 1
+            yield row
+
+    write_table(path, counted(), DUMP_COLUMNS, output_format=output_format, sheet_name="Properties")
+    return written
+
+
+def lookup_elements(ifc_file_path, cache_dir, nome_oggetti=None, guids=None):
+    """Ids of the elements with these NomeOggetto/GUID values, from the model cache's lookup indexes.
+
+    A file not in the cache yet is indexed first, with the STEP scan rather
+    than a second ifcopenshell parse. The cached values are resolved like
+    iter_element_psets resolves them, type Psets included.
+    """
+    model = model_cache.load_model(ifc_file_path, cache_dir, extraction_mode='step', nome_oggetti=nome_oggetti,
+                                   guids=guids)
+    return list(model['property_index'])
+
+
+def run(args):
+    """The `dump` command; see cli.py for its arguments."""
+    filters = {
+        'ifc_types': args.ifc_types,
+        'nome_oggetti': set(args.nome_oggetti) if args.nome_oggetti else None,
+        'guids': set(args.guids) if args.guids else None,
+        'pset_names': set(args.pset_names) if args.pset_names else None,
+        'property_names': set(args.property_names) if args.property_names else None,
+    }
+    if args.cache_dir is not None and (args.nome_oggetti or args.guids):
+        filters['element_ids'] = lookup_elements(args.ifc_file, args.cache_dir, filters['nome_oggetti'],
+                                                 filters['guids'])
+    ifc_file = ifcopenshell.open(args.ifc_file)
+    if args.output is None:
+        print_psets_for_elements(ifc_file, **filters)
+    else:
+        written = dump_properties(ifc_file, args.output, **filters)
+        if written:
+            print(f"{written} properties written to {args.output}")
+        else:
+            print("No properties match the filters; nothing written")
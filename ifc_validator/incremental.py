@@ -0,0 +1,268 @@
+import hashlib
+import json
+import os
+from collections import Counter
+
+from . import model_cache
+from .reports import write_sheets
+from .requirements import load_requirements
+from .rules import compile_rules
+from .validation import check_elements, check_project, check_project_values
+
+# Bump when the layout of the state file changes, so old files force a full check
+STATE_VERSION = 3
+
+# Element-level issue lists, in report order
+ELEMENT_KEYS = ['required', 'fixed', 'unexpected_report', 'unexpected_pset_report', 'invalid_value_report']
+
+# Sheet name of each issue kind in the delta report
+KIND_NAMES = {
+    'required': "Element-Level Issues",
+    'fixed': "Element-Level Issues",
+    'project_level_issues': "Project-Level Issues",
+    'unexpected_report': "Unexpected Parameters",
+    'unexpected_pset_report': "Unexpected Psets",
+    'invalid_value_report': "Invalid Values",
+    'project_value_issues': "Project-Level Invalid Values",
+}
+
+
+def _normalized(value):
+    # The model cache returns a boolean GUID as 0/1; hash booleans alike
+    return int(value) if isinstance(value, bool) else value
+
+
+def element_hash(record, rules):
+    """Hash what the checks of a RuleSet can see of an element.
+
+    That is its NomeOggetto and GUID, the names of its Psets and properties,
+    and the values of the properties with a value constraint (STEP 4f). The
+    checks read no other value, so those are left out of the hash: a state
+    is only reused under the same rules (see rules_fingerprint).
+    """
+    psets = record['psets']
+    names = '\x00'.join(psets) + '\x01' + '\x02'.join(map('\x00'.join, psets.values()))
+    object_rules = rules.objects.get(record['nome_oggetto'])
+    value_checks = object_rules.values + rules.fixed_values if object_rules is not None else rules.fixed_values
+    values = [psets[pset_name][prop_name] for (pset_name, prop_name), _ in value_checks
+              if prop_name in psets.get(pset_name, ())]
+    content = repr((record['nome_oggetto'], _normalized(record['guid']), values)) + '\x03' + names
+    return hashlib.blake2b(content.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def rules_fingerprint(rules):
+    """Hash a RuleSet independently of set iteration order."""
+    def texts(values):
+        return [(pair, value_rule.text) for pair, value_rule in values]
+
+    content = (sorted((nome_oggetto, object_rules.required, texts(object_rules.values))
+                      for nome_oggetto, object_rules in rules.objects.items()),
+               rules.fixed, texts(rules.fixed_values), texts(rules.project_values))
+    return hashlib.blake2b(repr(content).encode('utf-8'), digest_size=16).hexdigest()
+
+
+def _element_keys(property_index):
+    # GlobalId per element, made unique when an export repeats one
+    seen = {}
+    for element_id, record in property_index.items():
+        global_id = record.get('global_id') or f"#{element_id}"
+        seen[global_id] = seen.get(global_id, 0) + 1
+        yield element_id, global_id if seen[global_id] == 1 else f"{global_id}#{seen[global_id]}"
+
+
+def load_state(path):
+    """Read a state file written by save_state, or None if it is missing or outdated."""
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        state = json.load(f)
+    return state if state.get('version') == STATE_VERSION else None
+
+
+def save_state(state, path):
+    with open(path, 'w', encoding='utf-8') as f:
+        # json.dumps encodes in C; json.dump streams through the pure-Python encoder
+        f.write(json.dumps(state, ensure_ascii=False))
+
+
+def _check_changed(property_index, element_ids, rules):
+    # One check_elements() run over the changed elements; returns their
+    # {kind: [issue]} dicts in the order of element_ids. Each record is
+    # checked with its position as GUID, which keeps elements sharing a GUID
+    # property apart in the issue store; the rows get the real GUID back.
+    records = [property_index[element_id] for element_id in element_ids]
+    checked = check_elements({position: {**record, 'guid': position} for position, record in enumerate(records)},
+                             rules)
+    issues = [{} for _ in records]
+    for kind in ELEMENT_KEYS:
+        for issue in checked[kind]:
+            position = issue['GUID']
+            issue['GUID'] = records[position]['guid']
+            issues[position].setdefault(kind, []).append(issue)
+    return issues
+
+
+def revalidate(model, rules, previous_state=None):
+    """Validate a model, re-checking only the elements that changed since `previous_state`.
+
+    Elements are matched by GlobalId; an element whose element_hash() is the
+    same as in the previous state keeps its previous issues, every other one
+    is checked again, all of them in one check_elements() run. All elements
+    are checked when there is no previous state or the rules changed.
+
+    Returns (results, state, delta, stats):
+      results  the validate_model() dict, identical to a full run
+      state    what to pass as previous_state next time (see save_state)
+      delta    {'new', 'resolved', 'unchanged'}: lists of issues with their kind and GlobalId
+      stats    counts of added, changed, unchanged and removed elements
+    """
+    fingerprint = rules_fingerprint(rules)
+    previous_elements = {}
+    if previous_state and previous_state['rules'] == fingerprint:
+        previous_elements = previous_state['elements']
+
+    stats = {'added': 0, 'changed': 0, 'unchanged': 0, 'removed': 0}
+    property_index = model['property_index']
+    elements = {}
+    changed = []  # (element id, key, hash) of the elements to check again
+    for element_id, key in _element_keys(property_index):
+        digest = element_hash(property_index[element_id], rules)
+        previous = previous_elements.get(key)
+        if previous is not None and previous['hash'] == digest:
+            elements[key] = previous
+            stats['unchanged'] += 1
+        else:
+            elements[key] = None  # Keeps the element order; filled in below
+            changed.append((element_id, key, digest))
+            stats['changed' if previous is not None else 'added'] += 1
+    issues = _check_changed(property_index, [element_id for element_id, _, _ in changed], rules)
+    for (_, key, digest), element_issues in zip(changed, issues):
+        elements[key] = {'hash': digest, 'issues': element_issues}
+    stats['removed'] = len(previous_elements.keys() - elements.keys())
+
+    project_level_issues = check_project(model['project_psets'])
+    project_value_issues = check_project_values(model['project_psets'], rules)
+    state = {
+        'version': STATE_VERSION,
+        'rules': fingerprint,
+        'project_level_issues': project_level_issues,
+        'project_value_issues': project_value_issues,
+        'elements': elements,
+    }
+
+    def merged(kind):
+        return [issue for element in elements.values() for issue in element['issues'].get(kind, [])]
+
+    results = {
+        'element_count': model['element_count'],
+        'missing_report': merged('required') + merged('fixed'),
+        'project_level_issues': project_level_issues,
+        'unexpected_report': merged('unexpected_report'),
+        'unexpected_pset_report': merged('unexpected_pset_report'),
+        'invalid_value_report': merged('invalid_value_report'),
+        'project_value_issues': project_value_issues,
+    }
+    return results, state, diff_states(previous_state, state), stats
+
+
+def _issue_rows(global_id, issues):
+    # Delta rows of the {kind: [issue]} issues of one element (or the project)
+    return [{'Check': KIND_NAMES[kind], 'GlobalId': global_id, **issue}
+            for kind, kind_issues in issues.items() for issue in kind_issues]
+
+
+def _diff_issues(delta, global_id, previous_issues, issues):
+    # Add the issues of one element to `delta`; identity ignores list order,
+    # and an issue listed twice is matched twice
+    def identities(rows):
+        return [json.dumps(row, sort_keys=True, ensure_ascii=False) for row in rows]
+
+    rows = _issue_rows(global_id, issues)
+    if not previous_issues:
+        delta['new'] += rows
+        return
+    previous_rows = _issue_rows(global_id, previous_issues)
+    remaining = Counter(identities(previous_rows))
+    for row, identity in zip(rows, identities(rows)):
+        if remaining[identity]:
+            remaining[identity] -= 1
+            delta['unchanged'].append(row)
+        else:
+            delta['new'].append(row)
+    for row, identity in zip(previous_rows, identities(previous_rows)):
+        if remaining[identity]:
+            remaining[identity] -= 1
+            delta['resolved'].append(row)
+
+
+def diff_states(previous_state, state):
+    """Split the issues of `state` into new, resolved and unchanged relative to `previous_state`.
+
+    Only the elements added, changed or removed since `previous_state` are
+    compared issue by issue; an element with the same hash under the same
+    rules keeps the same issues, which are all unchanged.
+    """
+    delta = {'new': [], 'resolved': [], 'unchanged': []}
+    project_keys = ('project_level_issues', 'project_value_issues')
+    previous_elements = {}
+    same_rules = False
+    if previous_state:
+        previous_elements = previous_state['elements']
+        same_rules = previous_state['rules'] == state['rules']
+        _diff_issues(delta, '', {key: previous_state[key] for key in project_keys},
+                     {key: state[key] for key in project_keys})
+    else:
+        _diff_issues(delta, '', {}, {key: state[key] for key in project_keys})
+
+    for key, element in state['elements'].items():
+        previous = previous_elements.get(key)
+        if same_rules and previous is not None and previous['hash'] == element['hash']:
+            delta['unchanged'] += _issue_rows(key, element['issues'])
+        else:
+            _diff_issues(delta, key, previous['issues'] if previous is not None else {}, element['issues'])
+    for key, previous in previous_elements.items():
+        if key not in state['elements']:
+            delta['resolved'] += _issue_rows(key, previous['issues'])
+    return delta
+
+
+# Columns of the delta sheets, which mix the issues of every check
+DELTA_COLUMNS = ['Check', 'GlobalId', 'GUID', 'NomeOggetto', 'Missing Parameter', 'Expected Pset',
+                 'Unexpected Parameter', 'Pset', 'Unexpected Pset', 'Invalid Parameter', 'Value', 'Constraint']
+
+
+def save_delta_report(delta, stats, report_filename, ifc_file_path):
+    """Write the delta of an incremental run; the format follows the file extension."""
+    info = {'IFC File': ifc_file_path, **stats, **{f"{name} issues": len(rows) for name, rows in delta.items()}}
+    write_sheets(report_filename, [
+        ("IFC Info", [info]),
+        ("New Issues", delta['new'], DELTA_COLUMNS),
+        ("Resolved Issues", delta['resolved'], DELTA_COLUMNS),
+        ("Unchanged Issues", delta['unchanged'], DELTA_COLUMNS),
+    ])
+
+
+def run(args):
+    """The `revalidate` command; see cli.py for its arguments."""
+    cache_dir = args.cache_dir or model_cache.DEFAULT_CACHE_DIR
+
+    rules = compile_rules(load_requirements(args.excel_file))
+    previous_state = load_state(args.state)
+    if previous_state is None and args.previous_ifc:
+        print(f"Building state of previous revision: {args.previous_ifc}")
+        previous_model = model_cache.load_model(args.previous_ifc, cache_dir)
+        _, previous_state, _, _ = revalidate(previous_model, rules)
+
+    print(f"Opening IFC file: {args.ifc_file}")
+    model = model_cache.load_model(args.ifc_file, cache_dir)
+    results, state, delta, stats = revalidate(model, rules, previous_state)
+    save_state(state, args.state)
+
+    print(f"Elements: {stats['added']} added, {stats['changed']} changed, "
+          f"{stats['unchanged']} unchanged, {stats['removed']} removed")
+    print(f"Issues: {len(delta['new'])} new, {len(delta['resolved'])} resolved, "
+          f"{len(delta['unchanged'])} unchanged")
+
+    save_delta_report(delta, stats, args.output, args.ifc_file)
+    print(f"\nReport saved to {args.output}")
+
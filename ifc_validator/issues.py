@@ -0,0 +1,219 @@
+from array import array
+from collections import Counter
+from itertools import repeat
+
+# Issue kinds: (parameter field, Pset field, extra fields) of their rows. Every
+# row starts with the element's GUID and NomeOggetto; unexpected Psets have no
+# parameter.
+ISSUE_KINDS = {
+    'missing': ('Missing Parameter', 'Expected Pset', ()),
+    'unexpected_parameter': ('Unexpected Parameter', 'Pset', ()),
+    'unexpected_pset': (None, 'Unexpected Pset', ()),
+    'invalid_value': ('Invalid Parameter', 'Pset', ('Value', 'Constraint')),
+}
+
+
+class IssueStore:
+    """Interned values shared by the issue lists of one check run.
+
+    Every distinct value (Pset and parameter names, GUIDs, NomeOggetto
+    classes) is stored once and referred to by an integer code, and every
+    (GUID, NomeOggetto) element by an element code, so the memory of a run
+    grows with the distinct strings rather than with the number of issues.
+    """
+
+    def __init__(self):
+        self.values = []
+        self._codes = {}
+        self.element_guids = array('i')
+        self.element_names = array('i')
+        self._elements = {}
+
+    def code(self, value):
+        # Strings are the common case; other values are keyed with their type
+        # so that True, 1 and 1.0 stay distinct
+        key = value if type(value) is str else (type(value), value)
+        code = self._codes.get(key)
+        if code is None:
+            code = self._codes[key] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def element(self, guid, nome_oggetto):
+        """Code of the element with this GUID and NomeOggetto."""
+        key = (self.code(guid), self.code(nome_oggetto))
+        code = self._elements.get(key)
+        if code is None:
+            code = self._elements[key] = len(self.element_guids)
+            self.element_guids.append(key[0])
+            self.element_names.append(key[1])
+        return code
+
+    def __getstate__(self):
+        # The lookup dicts are rebuilt on unpickling instead of being sent along
+        return self.values, self.element_guids, self.element_names
+
+    def __setstate__(self, state):
+        self.values, self.element_guids, self.element_names = state
+        self._codes = {value if type(value) is str else (type(value), value): code
+                       for code, value in enumerate(self.values)}
+        self._elements = {key: code for code, key in enumerate(zip(self.element_guids, self.element_names))}
+
+
+class IssueList:
+    """Issues of one kind, kept as typed arrays of codes into an IssueStore.
+
+    Behaves like the list of issue dicts it replaces: len(), indexing and
+    iteration give {'GUID', 'NomeOggetto', <parameter field>, <Pset field>,
+    <extra fields>} dicts, built one at a time. to_frame() gives a DataFrame view with
+    categorical columns for the reporting steps.
+    """
+
+    def __init__(self, kind, store=None):
+        self.kind = kind
+        self.param_field, self.pset_field, self.extra_fields = ISSUE_KINDS[kind]
+        self.store = store if store is not None else IssueStore()
+        self.elements = array('i')
+        self.psets = array('i')
+        self.params = array('i')
+        self.extras = [array('i') for _ in self.extra_fields]
+
+    @property
+    def columns(self):
+        return ['GUID', 'NomeOggetto'] + [field for field in (self.param_field, self.pset_field) if field] + \
+            list(self.extra_fields)
+
+    def append(self, element, pset, param=None, *extras):
+        """Add an issue of an element code (see IssueStore.element), its Pset and parameter names
+        and the values of the kind's extra fields."""
+        self.elements.append(element)
+        self.psets.append(self.store.code(pset))
+        if self.param_field:
+            self.params.append(self.store.code(param))
+        for codes, value in zip(self.extras, extras):
+            codes.append(self.store.code(value))
+
+    def extend_codes(self, elements, psets, params=None, extras=()):
+        """Append issues given as int32 numpy arrays of codes, one entry per issue.
+
+        `elements` holds element codes (see IssueStore.element), the others
+        value codes of this list's store (see IssueStore.code); `params` is
+        left out for unexpected Psets. Lets a whole table of issues be added
+        without building a row.
+        """
+        self.elements.frombytes(elements.tobytes())
+        self.psets.frombytes(psets.tobytes())
+        if self.param_field:
+            self.params.frombytes(params.tobytes())
+        for codes, values in zip(self.extras, extras):
+            codes.frombytes(values.tobytes())
+
+    def extend(self, other):
+        """Append the issues of another list of the same kind, from any store."""
+        if other.store is self.store:
+            self.elements.extend(other.elements)
+            self.psets.extend(other.psets)
+            self.params.extend(other.params)
+            for codes, other_codes in zip(self.extras, other.extras):
+                codes.extend(other_codes)
+            return
+        # Translate the other store's codes once per distinct value, not per issue
+        values = [self.store.code(value) for value in other.store.values]
+        elements = [self.store.element(other.store.values[guid], other.store.values[name])
+                    for guid, name in zip(other.store.element_guids, other.store.element_names)]
+        self.elements.extend(elements[code] for code in other.elements)
+        self.psets.extend(values[code] for code in other.psets)
+        self.params.extend(values[code] for code in other.params)
+        for codes, other_codes in zip(self.extras, other.extras):
+            codes.extend(values[code] for code in other_codes)
+
+    @classmethod
+    def concat(cls, issue_lists):
+        """One list with the issues of several lists of the same kind, in order."""
+        issue_lists = list(issue_lists)
+        result = cls(issue_lists[0].kind, issue_lists[0].store)
+        for issues in issue_lists:
+            result.extend(issues)
+        return result
+
+    def __add__(self, other):
+        return IssueList.concat([self, other])
+
+    def __len__(self):
+        return len(self.elements)
+
+    def counts(self):
+        """Number of issues per (NomeOggetto, Pset, parameter), in order of first occurrence.
+
+        The issues are counted on their codes, so no row is built; only the
+        distinct keys are decoded. The parameter is None for unexpected Psets.
+        """
+        names = self.store.element_names
+        params = self.params if self.param_field else repeat(-1)
+        counted = Counter(zip((names[element] for element in self.elements), self.psets, params))
+        values = self.store.values
+        return {(values[name], values[pset], values[param] if param >= 0 else None): count
+                for (name, pset, param), count in counted.items()}
+
+    def _row(self, position):
+        values = self.store.values
+        element = self.elements[position]
+        row = {'GUID': values[self.store.element_guids[element]],
+               'NomeOggetto': values[self.store.element_names[element]]}
+        if self.param_field:
+            row[self.param_field] = values[self.params[position]]
+        row[self.pset_field] = values[self.psets[position]]
+        for field, codes in zip(self.extra_fields, self.extras):
+            row[field] = values[codes[position]]
+        return row
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self._row(index) for index in range(*position.indices(len(self)))]
+        if position < 0:
+            position += len(self)
+        if not 0 <= position < len(self):
+            raise IndexError("issue index out of range")
+        return self._row(position)
+
+    def __iter__(self):
+        for position in range(len(self)):
+            yield self._row(position)
+
+    def __eq__(self, other):
+        if isinstance(other, (IssueList, list)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    def __repr__(self):
+        return f"<IssueList {self.kind}: {len(self)} issues, {len(self.store.values)} distinct values>"
+
+    def to_frame(self):
+        """The issues as a DataFrame with one categorical column per field."""
+        import numpy as np
+        import pandas as pd
+
+        def categorical(codes):
+            used, inverse = np.unique(codes, return_inverse=True)
+            categories = [self.store.values[code] for code in used]
+            # None is not a valid category: give it the missing code -1
+            kept = [index for index, value in enumerate(categories) if value is not None]
+            index = pd.Index([categories[position] for position in kept], dtype=object)
+            if not index.is_unique:
+                # e.g. a Value column holding both 1 and True, which pandas takes for one category
+                return np.array(categories, dtype=object)[inverse.reshape(-1)]
+            remap = np.full(len(categories), -1)
+            remap[kept] = np.arange(len(kept))
+            return pd.Categorical.from_codes(remap[inverse].reshape(-1), categories=index)
+
+        elements = np.frombuffer(self.elements, dtype=np.int32)
+        columns = {
+            'GUID': categorical(np.frombuffer(self.store.element_guids, dtype=np.int32)[elements]),
+            'NomeOggetto': categorical(np.frombuffer(self.store.element_names, dtype=np.int32)[elements]),
+        }
+        if self.param_field:
+            columns[self.param_field] = categorical(np.frombuffer(self.params, dtype=np.int32))
+        columns[self.pset_field] = categorical(np.frombuffer(self.psets, dtype=np.int32))
+        for field, codes in zip(self.extra_fields, self.extras):
+            columns[field] = categorical(np.frombuffer(codes, dtype=np.int32))
+        return pd.DataFrame(columns)
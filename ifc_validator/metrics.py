@@ -0,0 +1,96 @@
+import cProfile
+import json
+import sys
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+
+def peak_rss_mb(children=False):
+    """Peak resident set size of this process so far, in MB (None where unsupported).
+
+    With children=True, the peak of the largest child process that has
+    exited and been waited for (the forked shard workers, the batch
+    workers) instead; 0 before any has.
+    """
+    try:
+        import resource
+    except ImportError:
+        return None  # Windows
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+class Metrics:
+    """Wall time, CPU time, peak memory and counters of each pipeline stage.
+
+    Stages are recorded in the order they finish:
+
+        metrics = Metrics()
+        with metrics.stage("STEP 4b") as counters:
+            issues = check_project(project_psets)
+            counters['issues'] += len(issues)
+        metrics.save("metrics.json")
+    """
+
+    def __init__(self):
+        self.stages = []
+        self.started = time.time()
+
+    @contextmanager
+    def stage(self, name):
+        """Measure the enclosed block; yields a Counter for the stage's counters."""
+        counters = Counter()
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        try:
+            yield counters
+        finally:
+            self.add(name, time.perf_counter() - wall, time.process_time() - cpu, counters)
+
+    def add(self, name, wall_seconds, cpu_seconds, counters=None, worker_peak_rss_mb=None):
+        """Record a stage measured elsewhere, e.g. in worker processes.
+
+        worker_peak_rss_mb is the largest peak the workers that ran the stage
+        reported themselves, for stages that did not run in this process.
+        """
+        stage = {
+            'stage': name,
+            'wall_seconds': round(wall_seconds, 4),
+            'cpu_seconds': round(cpu_seconds, 4),
+            'peak_rss_mb': peak_rss_mb(),
+            'children_peak_rss_mb': peak_rss_mb(children=True),
+            'counters': dict(counters or {}),
+        }
+        if worker_peak_rss_mb is not None:
+            stage['worker_peak_rss_mb'] = worker_peak_rss_mb
+        self.stages.append(stage)
+
+    def to_dict(self):
+        return {
+            'started': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.started)),
+            'total_wall_seconds': round(time.time() - self.started, 4),
+            'stages': self.stages,
+        }
+
+    def save(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+
+def start_profile(profile_file=None):
+    """Start cProfile; returns a function that stops it and dumps the stats to `profile_file`.
+
+    Does nothing when profile_file is None. Inspect the dump with
+    `python -m pstats <file>` or snakeviz.
+    """
+    if profile_file is None:
+        return lambda: None
+    profiler = cProfile.Profile()
+    profiler.enable()
+
+    def stop():
+        profiler.disable()
+        profiler.dump_stats(profile_file)
+    return stop
@@ -0,0 +1,213 @@
+import hashlib
+import json
+import os
+import sqlite3
+
+import ifcopenshell
+
+from .defaults import DEFAULT_CACHE_DIR
+from .property_index import build_property_index, extract_project_psets, select_elements
+from .step_extract import index_step_file
+
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3  # Total size of the cache directory before eviction
+
+# Bump when the layout or the content of the cache files changes, so old files are ignored
+CACHE_VERSION = 5
+
+SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value);
+CREATE TABLE elements (position INTEGER PRIMARY KEY, element_id INTEGER, global_id TEXT, nome_oggetto TEXT, guid);
+CREATE TABLE properties (position INTEGER, pset TEXT, property TEXT, value, boolean INTEGER);
+CREATE TABLE project_properties (position INTEGER, pset TEXT, property TEXT, value, boolean INTEGER);
+"""
+
+# SQLite has no boolean type: the `boolean` column tells an IfcBoolean 0/1
+# from an integer, so values come back with the type they went in with
+
+# Created once the rows are in. The NomeOggetto and GUID indexes are the
+# lookup from those property values to elements (see load_cached_model);
+# the position index then fetches just the properties of the matches.
+INDEXES = """
+CREATE INDEX elements_nome_oggetto ON elements (nome_oggetto);
+CREATE INDEX elements_guid ON elements (guid);
+CREATE INDEX properties_position ON properties (position);
+"""
+
+
+def file_fingerprint(ifc_file_path, chunk_size=1 << 20):
+    """Return (size, mtime in ns, sha256 hex digest) of a file."""
+    stat = os.stat(ifc_file_path)
+    digest = hashlib.sha256()
+    with open(ifc_file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return stat.st_size, stat.st_mtime_ns, digest.hexdigest()
+
+
+def cache_path(ifc_file_path, cache_dir=DEFAULT_CACHE_DIR):
+    """Path of the cache file for the current content of an IFC file."""
+    size, mtime_ns, sha256 = file_fingerprint(ifc_file_path)
+    return os.path.join(cache_dir, f"{sha256}-{size}-{mtime_ns}-v{CACHE_VERSION}.sqlite")
+
+
+def _rows(psets_by_position):
+    for position, psets in psets_by_position:
+        for pset_name, props in psets.items():
+            for prop_name, value in props.items():
+                yield position, pset_name, prop_name, value, isinstance(value, bool)
+
+
+def _group(rows):
+    # Rebuild {position: {pset: {prop: value}}} from rows in insertion order
+    grouped = {}
+    for position, pset_name, prop_name, value, boolean in rows:
+        grouped.setdefault(position, {}).setdefault(pset_name, {})[prop_name] = bool(value) if boolean else value
+    return grouped
+
+
+def save_model(path, model):
+    """Write an index_model() result to a cache file.
+
+    The file is written under a temporary name and renamed into place, so a
+    concurrent reader never sees a half-written cache.
+    """
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)  # Left over by a crashed run
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.executescript(SCHEMA)
+        conn.executemany("INSERT INTO meta VALUES (?, ?)", [
+            ('element_count', model['element_count']),
+            ('project_count', len(model['project_psets'])),
+        ])
+        records = list(model['property_index'].items())
+        conn.executemany("INSERT INTO elements VALUES (?, ?, ?, ?, ?)", (
+            (position, element_id, record['global_id'], record['nome_oggetto'], record['guid'])
+            for position, (element_id, record) in enumerate(records)))
+        conn.executemany("INSERT INTO properties VALUES (?, ?, ?, ?, ?)",
+                         _rows((position, record['psets']) for position, (_, record) in enumerate(records)))
+        conn.executemany("INSERT INTO project_properties VALUES (?, ?, ?, ?, ?)",
+                         _rows(enumerate(model['project_psets'])))
+        conn.executescript(INDEXES)
+        conn.commit()
+    finally:
+        conn.close()
+    os.replace(tmp_path, path)
+
+
+def _selection(nome_oggetti, guids):
+    # WHERE clause and parameters of a select_elements() lookup on the elements table
+    clauses, parameters = [], []
+    for column, values in (('nome_oggetto', nome_oggetti), ('guid', guids)):
+        if values is not None:
+            clauses.append(f"{column} IN (SELECT value FROM json_each(?))")
+            parameters.append(json.dumps(list(values)))
+    return (" WHERE " + " AND ".join(clauses)) if clauses else "", parameters
+
+
+def load_cached_model(path, nome_oggetti=None, guids=None):
+    """Read a cache file back into the shape returned by index_model().
+
+    Property values keep their type, booleans included; a boolean GUID
+    comes back as 0/1. With
+    nome_oggetti and/or guids only the matching elements are read, like
+    property_index.select_elements, through the indexes of the file rather
+    than a scan; element_count stays the model's.
+    """
+    where, parameters = _selection(nome_oggetti, guids)
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        meta = dict(conn.execute("SELECT key, value FROM meta"))
+        if where:
+            psets = _group(conn.execute(f"SELECT * FROM properties WHERE position IN "
+                                        f"(SELECT position FROM elements{where}) ORDER BY rowid", parameters))
+        else:
+            psets = _group(conn.execute("SELECT * FROM properties ORDER BY rowid"))
+        property_index = {
+            element_id: {'psets': psets.get(position, {}), 'nome_oggetto': nome_oggetto, 'guid': guid,
+                         'global_id': global_id}
+            for position, element_id, global_id, nome_oggetto, guid
+            in conn.execute(f"SELECT * FROM elements{where} ORDER BY position", parameters)
+        }
+        project_psets = _group(conn.execute("SELECT * FROM project_properties ORDER BY rowid"))
+    finally:
+        conn.close()
+    return {
+        'element_count': meta['element_count'],
+        'property_index': property_index,
+        'project_psets': [project_psets.get(position, {}) for position in range(meta['project_count'])],
+    }
+
+
+def index_model(ifc_file_path, extraction_mode='relations', counters=None):
+    """Parse an IFC file and return everything the checks need from it.
+
+    {'element_count', 'property_index', 'project_psets'}
+
+    extraction_mode='step' reads the STEP text directly (see
+    step_extract.index_step_file) instead of opening the file with
+    ifcopenshell; the result is the same. `counters` (a Counter) is only
+    filled in that mode.
+    """
+    if extraction_mode == 'step':
+        return index_step_file(ifc_file_path, counters=counters)
+    ifc_file = ifcopenshell.open(ifc_file_path)
+    elements = ifc_file.by_type("IfcElement")
+    return {
+        'element_count': len(elements),
+        'property_index': build_property_index(ifc_file, elements, mode=extraction_mode),
+        'project_psets': extract_project_psets(ifc_file),
+    }
+
+
+def evict(cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES, keep=()):
+    """Delete the least recently used cache files until the directory fits in max_bytes."""
+    entries = []
+    for name in os.listdir(cache_dir):
+        if name.endswith('.sqlite'):
+            path = os.path.join(cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue  # Evicted by another process meanwhile
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        if path in keep:
+            continue
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+
+
+def load_model(ifc_file_path, cache_dir=DEFAULT_CACHE_DIR, extraction_mode='relations', max_bytes=DEFAULT_MAX_BYTES,
+               nome_oggetti=None, guids=None):
+    """Return index_model() for an IFC file, from the cache when its content is unchanged.
+
+    The cache key is the file's size, mtime and sha256, so re-validating an
+    unchanged file skips ifcopenshell.open entirely. A hit refreshes the
+    file's mtime, which is what evict() uses as its LRU order. nome_oggetti
+    and guids restrict the property index to the matching elements (see
+    load_cached_model); a miss still caches the whole model.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    path = cache_path(ifc_file_path, cache_dir)
+
+    if os.path.exists(path):
+        try:
+            model = load_cached_model(path, nome_oggetti=nome_oggetti, guids=guids)
+            os.utime(path)
+            return model
+        except (sqlite3.Error, OSError):
+            pass  # Unreadable or evicted meanwhile: rebuild it
+
+    model = index_model(ifc_file_path, extraction_mode=extraction_mode)
+    save_model(path, model)
+    evict(cache_dir, max_bytes, keep=(path,))
+    return dict(model, property_index=select_elements(model['property_index'], nome_oggetti, guids))
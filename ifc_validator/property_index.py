@@ -0,0 +1,244 @@
+from collections import defaultdict
+
+
+def get_property_value(prop):
+    """Return the plain Python value of an IfcPropertySingleValue."""
+    return getattr(prop.NominalValue, 'wrappedValue', str(prop.NominalValue))
+
+
+def property_sets(element):
+    """Yield the IfcPropertySets attached to an object occurrence, in relation order."""
+    if hasattr(element, 'IsDefinedBy'):
+        for rel in element.IsDefinedBy:
+            if rel.is_a('IfcRelDefinesByProperties'):
+                prop_set = rel.RelatingPropertyDefinition
+                if prop_set.is_a('IfcPropertySet'):
+                    yield prop_set
+
+
+def extract_psets(element):
+    """Extract all Psets and their properties from an IFC element."""
+    psets = defaultdict(dict)
+    for prop_set in property_sets(element):
+        pset_name = prop_set.Name
+        for prop in prop_set.HasProperties:
+            if hasattr(prop, 'Name') and hasattr(prop, 'NominalValue') and prop.NominalValue:
+                psets[pset_name][prop.Name] = get_property_value(prop)
+    return psets
+
+
+def extract_project_psets(ifc_file):
+    """Extract the Psets of every IfcProject in the file, for STEP 4b."""
+    return [dict(extract_psets(project)) for project in ifc_file.by_type("IfcProject")]
+
+
+def decode_pset(prop_set):
+    """Decode an IfcPropertySet once.
+
+    Returns its {prop: value} mapping plus the first NomeOggetto and GUID
+    values it holds, as (found, value) pairs.
+    """
+    props = {}
+    nome_oggetto = guid = (False, None)
+    for prop in prop_set.HasProperties:
+        if hasattr(prop, 'Name') and hasattr(prop, 'NominalValue') and prop.NominalValue:
+            value = get_property_value(prop)
+            props[prop.Name] = value
+            if prop.Name == 'NomeOggetto' and not nome_oggetto[0]:
+                nome_oggetto = (True, value)
+            elif prop.Name == 'GUID' and not guid[0]:
+                guid = (True, value)
+    return props, nome_oggetto, guid
+
+
+def decode_cached(prop_set, decoded):
+    """decode_pset() memoized in `decoded` on the Pset's entity id."""
+    pset_id = prop_set.id()
+    if pset_id not in decoded:
+        decoded[pset_id] = decode_pset(prop_set)
+    return decoded[pset_id]
+
+
+def element_type(element):
+    """Return the IfcTypeObject of an element, or None (IsTypedBy in IFC4, IsDefinedBy in IFC2X3)."""
+    for rel in getattr(element, 'IsTypedBy', None) or ():
+        return rel.RelatingType
+    for rel in getattr(element, 'IsDefinedBy', None) or ():
+        if rel.is_a('IfcRelDefinesByType'):
+            return rel.RelatingType
+    return None
+
+
+def type_property_sets(type_object):
+    """The IfcPropertySets a type object holds in HasPropertySets."""
+    return [prop_set for prop_set in getattr(type_object, 'HasPropertySets', None) or ()
+            if prop_set.is_a('IfcPropertySet')]
+
+
+def _attach(record, pset_name, decoded_pset, found, inherited=False):
+    # Add one decoded Pset to an index record. The props dict is shared with
+    # every other element that has the Pset and is only copied on a merge:
+    # a second occurrence Pset of the same name overrides the first, while a
+    # type Pset (inherited=True) only fills in what the occurrence lacks.
+    # `found` holds the (id(record), key) pairs whose NomeOggetto/GUID is set.
+    props, nome_oggetto, guid = decoded_pset
+    if not props:
+        return  # extract_psets only lists Psets with at least one valued property
+    psets = record['psets']
+    if pset_name not in psets:
+        psets[pset_name] = props
+    elif inherited:
+        psets[pset_name] = {**props, **psets[pset_name]}
+    else:
+        psets[pset_name] = {**psets[pset_name], **props}
+    if nome_oggetto[0] and (id(record), 'nome_oggetto') not in found:
+        found.add((id(record), 'nome_oggetto'))
+        record['nome_oggetto'] = str(nome_oggetto[1]).strip() if nome_oggetto[1] else None
+    if guid[0] and (id(record), 'guid') not in found:
+        found.add((id(record), 'guid'))
+        record['guid'] = guid[1]
+
+
+def index_element(element, decoded=None):
+    """Walk the IsDefinedBy relations of an element once.
+
+    Returns a record with the element's Psets ({pset: {prop: value}}), its
+    NomeOggetto (stripped, or None when missing/empty), its GUID property and
+    its IFC GlobalId.
+    NomeOggetto and GUID are taken from the first Pset that defines them,
+    like the old get_nome_oggetto/get_element_guid helpers did. The Psets of
+    the element's type are inherited; occurrence values take precedence.
+    Pass the same `decoded` dict for all elements of a model to decode each
+    shared Pset only once.
+    """
+    if decoded is None:
+        decoded = {}
+    record = {'psets': {}, 'nome_oggetto': None, 'guid': None, 'global_id': element.GlobalId}
+    found = set()
+    for prop_set in property_sets(element):
+        _attach(record, prop_set.Name, decode_cached(prop_set, decoded), found)
+    type_object = element_type(element)
+    if type_object is not None:
+        for prop_set in type_property_sets(type_object):
+            _attach(record, prop_set.Name, decode_cached(prop_set, decoded), found, inherited=True)
+    return record
+
+
+def split_relations(ifc_file, elements, bounds, counters=None):
+    """Assign the property and type relations of a model to shards of `elements`.
+
+    `bounds` are the (start, stop) slices of the shards. Returns
+    {bounds: (property relations, type relations)}, each relation listed
+    under every shard it reaches, in file order, so that each shard's
+    index_by_relations only visits its own relations. Every relation is
+    walked once here, in the parent, instead of once per shard. `counters`
+    (a Counter), when given, is increased by the relations visited.
+    """
+    shard_of = {}
+    for shard, (start, stop) in enumerate(bounds):
+        for element in elements[start:stop]:
+            shard_of[element.id()] = shard
+    split = [([], []) for _ in bounds]
+    for position, rel_type in enumerate(('IfcRelDefinesByProperties', 'IfcRelDefinesByType')):
+        relations = ifc_file.by_type(rel_type)
+        for rel in relations:
+            shards = dict.fromkeys(shard_of[obj.id()] for obj in rel.RelatedObjects if obj.id() in shard_of)
+            for shard in shards:
+                split[shard][position].append(rel)
+        if counters is not None:
+            counters['relations_visited'] += len(relations)
+    return dict(zip(bounds, split))
+
+
+def index_by_relations(ifc_file, elements, counters=None, relations=None):
+    """Build the property index from IfcRelDefinesByProperties instead of IsDefinedBy.
+
+    Every relation is visited once and each IfcPropertySet is decoded once,
+    however many objects share it; the decoded mapping is then handed to all
+    of its RelatedObjects. The Psets of types are handed to their occurrences
+    the same way, through IfcRelDefinesByType, after the occurrence Psets so
+    that occurrence values take precedence. Elements that receive the same
+    Pset share one dict, so records must be treated as read-only. `counters`
+    (a Counter), when given, is increased by the relations visited, Psets
+    decoded and properties read. `relations`, a (property relations, type
+    relations) pair from split_relations, replaces the model's relations.
+    """
+    index = {
+        element.id(): {'psets': {}, 'nome_oggetto': None, 'guid': None, 'global_id': element.GlobalId}
+        for element in elements
+    }
+    found = set()
+    decoded = {}
+
+    if relations is None:
+        relations = (ifc_file.by_type('IfcRelDefinesByProperties'), ifc_file.by_type('IfcRelDefinesByType'))
+    relations, type_relations = relations
+    for rel in relations:
+        prop_set = rel.RelatingPropertyDefinition
+        if not prop_set.is_a('IfcPropertySet'):
+            continue
+        # Skip relations that only reach objects outside the index (project,
+        # types, or elements of another shard) before decoding anything
+        targets = [index[obj.id()] for obj in rel.RelatedObjects if obj.id() in index]
+        if targets:
+            decoded_pset = decode_cached(prop_set, decoded)
+            for record in targets:
+                _attach(record, prop_set.Name, decoded_pset, found)
+
+    for rel in type_relations:
+        targets = [index[obj.id()] for obj in rel.RelatedObjects if obj.id() in index]
+        if targets:
+            for prop_set in type_property_sets(rel.RelatingType):
+                decoded_pset = decode_cached(prop_set, decoded)
+                for record in targets:
+                    _attach(record, prop_set.Name, decoded_pset, found, inherited=True)
+
+    if counters is not None:
+        counters['elements_scanned'] += len(index)
+        counters['relations_visited'] += len(relations) + len(type_relations)
+        counters['psets_decoded'] += len(decoded)
+        counters['properties_read'] += sum(len(props) for props, _, _ in decoded.values())
+    return index
+
+
+def select_elements(property_index, nome_oggetti=None, guids=None):
+    """The records whose NomeOggetto is in `nome_oggetti` and GUID property in `guids`.
+
+    None accepts every value; the index order is kept. model_cache answers
+    the same lookup from the indexed columns of a cached model.
+    """
+    if nome_oggetti is None and guids is None:
+        return property_index
+    nome_oggetti = set(nome_oggetti) if nome_oggetti is not None else None
+    guids = set(guids) if guids is not None else None
+    return {element_id: record for element_id, record in property_index.items()
+            if (nome_oggetti is None or record['nome_oggetto'] in nome_oggetti)
+            and (guids is None or record['guid'] in guids)}
+
+
+def build_property_index(ifc_file, elements, mode='relations', counters=None, relations=None):
+    """Build the per-model property index: element id -> record.
+
+    Each record holds 'psets' ({pset: {prop: value}}, type Psets included),
+    'nome_oggetto', 'guid' and 'global_id', see index_element(). The index
+    keeps the order of `elements`, so iterating it gives the same order as
+    ifc_file.by_type("IfcElement").
+
+    mode='relations' visits every property and type relation once
+    (index_by_relations); mode='elements' walks each element's IsDefinedBy
+    and type (index_element). Both decode every Pset once. `counters` (a
+    Counter), when given, receives the elements scanned, Psets decoded and
+    properties read. `relations` (see split_relations) only applies to the
+    'relations' mode.
+    """
+    if mode == 'relations':
+        return index_by_relations(ifc_file, elements, counters=counters, relations=relations)
+    if mode == 'elements':
+        decoded = {}
+        index = {element.id(): index_element(element, decoded) for element in elements}
+        if counters is not None:
+            counters['elements_scanned'] += len(index)
+            counters['psets_decoded'] += len(decoded)
+            counters['properties_read'] += sum(len(props) for props, _, _ in decoded.values())
+        return index
+    raise ValueError(f"Unknown extraction mode: {mode}")
@@ -0,0 +1,427 @@
+import csv
+import json
+import os
+from collections import Counter
+
+
+# === STEP 5: Report Results ===
+
+def print_report(results, detail=True, summary=None):
+    """Print the validation results to the console.
+
+    Sections whose issue list is absent from `results` are skipped, so app1.py
+    can print its shorter report with the same function. With detail=False
+    only the summary is printed (see summarize and print_summary), which
+    stays fast on models with hundreds of thousands of issues.
+    """
+    if not detail:
+        print_summary(summary if summary is not None else summarize(results))
+        return
+
+    print("\n=== VALIDATION REPORT ===")
+
+    # 1. Project-Level Pset Issues
+    project_level_issues = results['project_level_issues']
+    print("\n--- PROJECT-LEVEL CHECK ---")
+    if not project_level_issues:
+        print("✅ All required project-level parameters are present.")
+    else:
+        print(f"❌ Missing {len(project_level_issues)} project-level parameters:")
+        for issue in project_level_issues:
+            print(f"- Missing '{issue['Missing Parameter']}' in Pset '{issue['Pset']}'")
+
+    # 2. Element-Level Issues (Excel + fixed checks)
+    missing_report = results['missing_report']
+    print("\n--- ELEMENT-LEVEL CHECKS ---")
+    if not missing_report:
+        print("✅ All required element-level parameters are present.")
+    else:
+        print(f"❌ {len(missing_report)} element-level issues found:")
+        for issue in missing_report:
+            print(f"- GUID {issue['GUID']} | NomeOggetto: {issue['NomeOggetto']}")
+            print(f"  Missing: {issue['Missing Parameter']} in Pset '{issue['Expected Pset']}'\n")
+    # 3. Unexpected Parameters
+    if 'unexpected_report' in results:
+        unexpected_report = results['unexpected_report']
+        print("\n--- UNEXPECTED PARAMETERS CHECK ---")
+        if not unexpected_report:
+            print("✅ No unexpected parameters found in elements.")
+        else:
+            print(f"❌ {len(unexpected_report)} unexpected parameters found in elements:")
+            for issue in unexpected_report:
+                print(f"- GUID {issue['GUID']} | NomeOggetto: {issue['NomeOggetto']}")
+                print(f"  Unexpected: {issue['Unexpected Parameter']} in Pset '{issue['Pset']}'\n")
+    # 4. Unexpected Psets
+    if 'unexpected_pset_report' in results:
+        unexpected_pset_report = results['unexpected_pset_report']
+        print("\n--- UNEXPECTED PSETS CHECK ---")
+        if not unexpected_pset_report:
+            print("✅ No unexpected Psets found in elements.")
+        else:
+            print(f"❌ {len(unexpected_pset_report)} unexpected Psets found in elements:")
+            for issue in unexpected_pset_report:
+                print(f"- GUID {issue['GUID']} | NomeOggetto: {issue['NomeOggetto']}")
+                print(f"  Unexpected Pset: '{issue['Unexpected Pset']}'\n")
+    # 5. Invalid Values (elements and project)
+    if 'invalid_value_report' in results:
+        invalid_value_report = results['invalid_value_report']
+        project_value_issues = results.get('project_value_issues', [])
+        print("\n--- PARAMETER VALUES CHECK ---")
+        if not invalid_value_report and not project_value_issues:
+            print("✅ All constrained parameter values are valid.")
+        else:
+            print(f"❌ {len(invalid_value_report) + len(project_value_issues)} invalid parameter values found:")
+            for issue in project_value_issues:
+                print(f"- Project | '{issue['Invalid Parameter']}' in Pset '{issue['Pset']}'")
+                print(f"  Value {issue['Value']!r} does not satisfy '{issue['Constraint']}'\n")
+            for issue in invalid_value_report:
+                print(f"- GUID {issue['GUID']} | NomeOggetto: {issue['NomeOggetto']}")
+                print(f"  Invalid: {issue['Invalid Parameter']} in Pset '{issue['Pset']}': "
+                      f"value {issue['Value']!r} does not satisfy '{issue['Constraint']}'\n")
+
+
+# Fields holding the Pset and the parameter of an issue row, whatever its kind
+PSET_FIELDS = ('Expected Pset', 'Pset', 'Unexpected Pset')
+PARAMETER_FIELDS = ('Missing Parameter', 'Unexpected Parameter', 'Invalid Parameter')
+
+# Columns of the per-group summary, one row per (check, NomeOggetto, Pset, parameter)
+SUMMARY_COLUMNS = ['Check', 'NomeOggetto', 'Pset', 'Parameter', 'Issues']
+
+# Groups printed per check by print_summary; the summary sheet has them all
+SUMMARY_CONSOLE_GROUPS = 20
+
+
+def _first_field(issue, fields):
+    return next((issue[field] for field in fields if field in issue), None)
+
+
+def issue_counts(issues):
+    """{(NomeOggetto, Pset, parameter): issues} of one issue list."""
+    if hasattr(issues, 'counts'):  # an IssueList, counted without building rows
+        return issues.counts()
+    counts = Counter()
+    for issue in issues:
+        counts[(issue.get('NomeOggetto'), _first_field(issue, PSET_FIELDS),
+                _first_field(issue, PARAMETER_FIELDS))] += 1
+    return dict(counts)
+
+
+# === STEP 5b: Summarize Results ===
+
+def summarize(results):
+    """Aggregate the issues of each check in one grouped pass.
+
+    Returns {'element_count', 'checks': {sheet name: issues}, 'groups': rows}
+    where the rows (SUMMARY_COLUMNS) count the issues per NomeOggetto, Pset
+    and parameter, most frequent first within each check. Checks absent
+    from `results` are left out. The result is plain JSON.
+    """
+    checks = {}
+    groups = []
+    for key, sheet_name in REPORT_SHEETS:
+        if key not in results:
+            continue
+        checks[sheet_name] = len(results[key])
+        counts = issue_counts(results[key])
+        for (nome_oggetto, pset, parameter), count in sorted(counts.items(), key=lambda item: -item[1]):
+            groups.append({'Check': sheet_name, 'NomeOggetto': nome_oggetto, 'Pset': pset, 'Parameter': parameter,
+                           'Issues': count})
+    return {'element_count': results.get('element_count'), 'checks': checks, 'groups': groups}
+
+
+def print_summary(summary):
+    """Print the issue count of each check and its most frequent (NomeOggetto, Pset, parameter) groups."""
+    print("\n=== VALIDATION REPORT (summary) ===")
+    for sheet_name, total in summary['checks'].items():
+        print(f"\n--- {sheet_name.upper()} ---")
+        if not total:
+            print("✅ None found.")
+            continue
+        print(f"❌ {total} issues found")
+        groups = [group for group in summary['groups'] if group['Check'] == sheet_name]
+        for group in groups[:SUMMARY_CONSOLE_GROUPS]:
+            where = " | ".join(str(group[field]) for field in ('NomeOggetto', 'Pset', 'Parameter')
+                               if group[field] is not None)
+            print(f"- {where}: {group['Issues']}")
+        if len(groups) > SUMMARY_CONSOLE_GROUPS:
+            print(f"  ... and {len(groups) - SUMMARY_CONSOLE_GROUPS} more groups in the summary sheet")
+
+
+def save_summary(summary, path):
+    """Write a summarize() result as JSON."""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(summary, f, ensure_ascii=False, default=str)
+
+
+# === STEP 6: Save Report ===
+
+# (results key, sheet name), in the order the sheets are written
+REPORT_SHEETS = [
+    ('missing_report', "Element-Level Issues"),
+    ('project_level_issues', "Project-Level Issues"),
+    ('unexpected_report', "Unexpected Parameters"),
+    ('unexpected_pset_report', "Unexpected Psets"),
+    ('invalid_value_report', "Invalid Values"),
+    ('project_value_issues', "Project-Level Invalid Values"),
+]
+
+
+# Excel rows per sheet, header included; longer sheets continue in "<name> (2)", ...
+EXCEL_MAX_ROWS = 1_048_576
+
+# Rows buffered before a Parquet row group is written
+PARQUET_BATCH_ROWS = 65_536
+
+
+def _columns(rows, columns):
+    # Take the columns from the first row when not given; None when there are no rows
+    rows = iter(rows)
+    first = next(rows, None)
+    if first is None:
+        return None, rows
+    if columns is None:
+        columns = list(first)
+
+    def chained():
+        yield first
+        yield from rows
+    return columns, chained()
+
+
+def _sheet_file(path, sheet_name):
+    # report.csv + "Element-Level Issues" -> report_element_level_issues.csv
+    stem, extension = os.path.splitext(path)
+    slug = sheet_name.lower().replace('-', ' ').replace(' ', '_')
+    return f"{stem}_{slug}{extension}"
+
+
+class XlsxReportWriter:
+    """Streams sheets into a write-only openpyxl workbook, splitting sheets over EXCEL_MAX_ROWS.
+
+    A workbook is a single file anyway, so single_table changes nothing.
+    """
+
+    def __init__(self, path, single_table=False):
+        from openpyxl import Workbook
+        self.path = path
+        self.workbook = Workbook(write_only=True)
+
+    def write_sheet(self, sheet_name, rows, columns=None):
+        columns, rows = _columns(rows, columns)
+        if columns is None:
+            return
+        part = 0
+        sheet_rows = EXCEL_MAX_ROWS
+        for row in rows:
+            if sheet_rows == EXCEL_MAX_ROWS:
+                part += 1
+                sheet = self.workbook.create_sheet(sheet_name if part == 1 else f"{sheet_name} ({part})")
+                sheet.append(columns)
+                sheet_rows = 1
+            sheet.append([row.get(column) for column in columns])
+            sheet_rows += 1
+
+    def close(self):
+        self.workbook.save(self.path)
+
+
+class CsvReportWriter:
+    """Streams each sheet into its own CSV file next to `path` (see _sheet_file).
+
+    With single_table=True the one sheet written goes to `path` itself.
+    """
+
+    def __init__(self, path, single_table=False):
+        self.path = path
+        self.single_table = single_table
+
+    def write_sheet(self, sheet_name, rows, columns=None):
+        columns, rows = _columns(rows, columns)
+        if columns is None:
+            return
+        path = self.path if self.single_table else _sheet_file(self.path, sheet_name)
+        with open(path, 'w', newline='', encoding='utf-8-sig') as f:
+            writer = csv.DictWriter(f, fieldnames=columns, extrasaction='ignore')
+            writer.writeheader()
+            writer.writerows(rows)
+
+    def close(self):
+        pass
+
+
+class JsonlReportWriter:
+    """Streams every sheet into one JSON Lines file, one issue per line with its "Sheet".
+
+    With single_table=True the "Sheet" field is left out.
+    """
+
+    def __init__(self, path, single_table=False):
+        self.file = open(path, 'w', encoding='utf-8')
+        self.single_table = single_table
+
+    def write_sheet(self, sheet_name, rows, columns=None):
+        for row in rows:
+            if columns is not None:
+                row = {column: row.get(column) for column in columns}
+            if not self.single_table:
+                row = {'Sheet': sheet_name, **row}
+            self.file.write(json.dumps(row, ensure_ascii=False, default=str))
+            self.file.write('\n')
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetReportWriter:
+    """Streams each sheet into its own Parquet file next to `path`, in row groups of PARQUET_BATCH_ROWS.
+
+    Columns whose first row group only holds numbers are numeric; every other
+    column is stored as strings. When a later row group has a value that does
+    not fit a numeric column (e.g. text in a Value column), the rows written
+    so far are rewritten with that column as strings (or as floats, for
+    integers followed by floats). With single_table=True
+    the one sheet written goes to `path` itself.
+    """
+
+    def __init__(self, path, single_table=False):
+        self.path = path
+        self.single_table = single_table
+
+    def write_sheet(self, sheet_name, rows, columns=None):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        columns, rows = _columns(rows, columns)
+        if columns is None:
+            return
+        writer = None
+        batch = []
+        try:
+            for row in rows:
+                batch.append(row)
+                if len(batch) == PARQUET_BATCH_ROWS:
+                    writer = self._write_batch(pa, pq, writer, sheet_name, columns, batch)
+                    batch = []
+            if batch or writer is None:
+                writer = self._write_batch(pa, pq, writer, sheet_name, columns, batch)
+        finally:
+            if writer is not None:
+                writer.close()
+
+    def _write_batch(self, pa, pq, writer, sheet_name, columns, batch):
+        path = self.path if self.single_table else _sheet_file(self.path, sheet_name)
+        values = {column: [row.get(column) for row in batch] for column in columns}
+        if writer is None:
+            schema = pa.schema([(column, self._arrow_type(pa, values[column])) for column in columns])
+            writer = pq.ParquetWriter(path, schema)
+        schema = pa.schema([self._widened(pa, field, values[field.name]) for field in writer.schema])
+        if schema != writer.schema:
+            # A Parquet file has one schema: read back the row groups written
+            # so far and write them again with the widened columns
+            writer.close()
+            written = pq.read_table(path)
+            writer = pq.ParquetWriter(path, schema)
+            if written.num_rows:
+                writer.write_table(self._table(pa, schema, {name: written.column(name).to_pylist()
+                                                            for name in written.column_names}))
+        writer.write_table(self._table(pa, writer.schema, values))
+        return writer
+
+    @staticmethod
+    def _table(pa, schema, values):
+        arrays = []
+        for field in schema:
+            column = values[field.name]
+            if pa.types.is_string(field.type):
+                column = [None if value is None else str(value) for value in column]
+            arrays.append(pa.array(column, type=field.type))
+        return pa.Table.from_arrays(arrays, schema=schema)
+
+    @classmethod
+    def _widened(cls, pa, field, values):
+        # The field itself if the values fit its type, else the field as
+        # floats (integers meeting floats) or as strings
+        if pa.types.is_string(field.type) or all(value is None for value in values):
+            return field
+        arrow_type = cls._arrow_type(pa, values)
+        if arrow_type == field.type or (arrow_type == pa.int64() and field.type == pa.float64()):
+            return field
+        if pa.types.is_integer(field.type) and arrow_type == pa.float64():
+            return pa.field(field.name, pa.float64())
+        return pa.field(field.name, pa.string())
+
+    @staticmethod
+    def _arrow_type(pa, values):
+        present = [value for value in values if value is not None]
+        if present and all(isinstance(value, int) and not isinstance(value, bool) for value in present):
+            return pa.int64()
+        if present and all(isinstance(value, (int, float)) and not isinstance(value, bool) for value in present):
+            return pa.float64()
+        return pa.string()
+
+    def close(self):
+        pass
+
+
+REPORT_WRITERS = {
+    'xlsx': XlsxReportWriter,
+    'csv': CsvReportWriter,
+    'jsonl': JsonlReportWriter,
+    'parquet': ParquetReportWriter,
+}
+
+
+def report_format(path):
+    """Report format of a file name, from its extension (.xlsx, .csv, .jsonl or .parquet)."""
+    extension = os.path.splitext(path)[1].lower().lstrip('.')
+    if extension not in REPORT_WRITERS:
+        raise ValueError(f"Unsupported report format '{extension}', use one of: {', '.join(REPORT_WRITERS)}")
+    return extension
+
+
+def write_sheets(path, sheets, output_format=None):
+    """Stream (sheet name, rows[, columns]) tuples into a report file.
+
+    Rows are dicts and may come from any iterable, so issues are written as
+    they are consumed instead of being collected in a DataFrame first. Sheets
+    without rows are left out. The columns default to the keys of the first
+    row.
+    """
+    writer = REPORT_WRITERS[output_format or report_format(path)](path)
+    try:
+        for sheet in sheets:
+            writer.write_sheet(*sheet)
+    finally:
+        writer.close()
+
+
+def write_table(path, rows, columns=None, output_format=None, sheet_name="Data"):
+    """Stream one table of rows into exactly `path`, as xlsx, csv, jsonl or parquet.
+
+    Like write_sheets with a single sheet, but CSV and Parquet go to `path`
+    itself and JSON Lines rows get no "Sheet" field.
+    """
+    writer = REPORT_WRITERS[output_format or report_format(path)](path, single_table=True)
+    try:
+        writer.write_sheet(sheet_name, rows, columns)
+    finally:
+        writer.close()
+
+
+def summary_sheets(summary):
+    """The "Summary" (issues per check) and "Summary by Parameter" sheets of a summarize() result."""
+    return [
+        ("Summary", [{'Check': sheet_name, 'Issues': total} for sheet_name, total in summary['checks'].items()]),
+        ("Summary by Parameter", summary['groups'], SUMMARY_COLUMNS),
+    ]
+
+
+def save_report(results, report_filename, ifc_file_path, output_format=None, summary=None):
+    """Write the validation results of one IFC file as xlsx, csv, jsonl or parquet.
+
+    The summary sheets (see summarize) come first, then one sheet per check.
+    """
+    sheets = [("IFC Info", [{"IFC File": ifc_file_path}])]
+    sheets += summary_sheets(summary if summary is not None else summarize(results))
+    sheets += [(sheet_name, results[key]) for key, sheet_name in REPORT_SHEETS if key in results]
+    write_sheets(report_filename, sheets, output_format=output_format)
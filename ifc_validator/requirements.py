@@ -0,0 +1,96 @@
+import hashlib
+import json
+import os
+
+from .defaults import DEFAULT_CACHE_DIR
+
+# The only columns of the requirements sheet the checks use
+REQUIREMENT_COLUMNS = ['Elemento', 'Parametri informativi', 'Pset_personalizzato']
+
+# Optional column with a value constraint per row (STEP 4f), see value_rules.py for the syntax
+CONSTRAINT_COLUMN = 'Vincolo valore'
+
+# Bump when the layout of the cached mapping changes
+CACHE_VERSION = 2
+
+
+def read_requirements_table(path):
+    """Read the three requirement columns from an .xlsx/.xls, .csv or .parquet export of the sheet.
+
+    Every cell comes back as a stripped string, the way STEP 1 always
+    converted them (empty cells become 'nan'). The CONSTRAINT_COLUMN is read
+    too when the sheet has it; its empty cells become None.
+    """
+    import pandas as pd  # Only needed when the mapping is not cached
+
+    wanted = REQUIREMENT_COLUMNS + [CONSTRAINT_COLUMN]
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.csv':
+        df = pd.read_csv(path, usecols=lambda column: column in wanted)
+    elif extension == '.parquet':
+        import pyarrow.parquet as pq
+        names = pq.read_schema(path).names
+        df = pd.read_parquet(path, columns=[column for column in wanted if column in names])
+    else:
+        df = pd.read_excel(path, usecols=lambda column: column in wanted)
+    missing = [column for column in REQUIREMENT_COLUMNS if column not in df.columns]
+    if missing:
+        raise ValueError(f"Requirements sheet is missing the columns {missing}")
+
+    table = pd.DataFrame({column: df[column].map(str).str.strip() for column in REQUIREMENT_COLUMNS})
+    if CONSTRAINT_COLUMN in df.columns:
+        table[CONSTRAINT_COLUMN] = pd.Series([None if pd.isna(value) or not str(value).strip() else str(value).strip()
+                                              for value in df[CONSTRAINT_COLUMN]], index=table.index, dtype=object)
+    return table
+
+
+def build_required_data(df):
+    """Group the requirement rows into {Elemento: [{'parameter', 'pset', 'constraint'}, ...]}.
+
+    'constraint' is None for the rows without one, and for every row of a
+    sheet without the CONSTRAINT_COLUMN.
+    """
+    constraints = df[CONSTRAINT_COLUMN] if CONSTRAINT_COLUMN in df.columns else [None] * len(df)
+    required_data = {}
+    for elemento, parameter, pset, constraint in zip(df['Elemento'], df['Parametri informativi'],
+                                                     df['Pset_personalizzato'], constraints):
+        required_data.setdefault(elemento, []).append({'parameter': parameter, 'pset': pset,
+                                                       'constraint': constraint})
+    return required_data
+
+
+def _cache_file(path, cache_dir):
+    key = hashlib.sha1(os.path.abspath(path).encode('utf-8')).hexdigest()
+    return os.path.join(cache_dir, f"requirements-{key}.json")
+
+
+# === STEP 1: Read Excel and Build Requirement Mapping ===
+
+def load_requirements(path, cache_dir=DEFAULT_CACHE_DIR):
+    """Load the requirement mapping of a workbook (or its CSV/Parquet export).
+
+    The mapping is cached in `cache_dir` keyed by the file's path, size and
+    mtime, so an unchanged workbook is not parsed again. Pass cache_dir=None
+    to always read the file.
+    """
+    if cache_dir is None:
+        return build_required_data(read_requirements_table(path))
+
+    stat = os.stat(path)
+    fingerprint = [os.path.abspath(path), stat.st_size, stat.st_mtime_ns, CACHE_VERSION]
+    cache_file = _cache_file(path, cache_dir)
+    try:
+        with open(cache_file, encoding='utf-8') as f:
+            cached = json.load(f)
+        if cached['fingerprint'] == fingerprint:
+            return cached['required_data']
+    except (OSError, ValueError, KeyError):
+        pass  # No cache yet, or unreadable: rebuild it
+
+    required_data = build_required_data(read_requirements_table(path))
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_file = f"{cache_file}.{os.getpid()}.tmp"
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump({'fingerprint': fingerprint, 'required_data': required_data}, f, ensure_ascii=False)
+    os.replace(tmp_file, cache_file)
+    return required_data
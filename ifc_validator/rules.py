@@ -0,0 +1,94 @@
+from collections import namedtuple
+
+from .value_rules import compile_constraint
+
+# Project-level Pset every model must carry (STEP 4b)
+PROJECT_PSET = "Informazioni progetto"
+PROJECT_KEYS = [
+    "NomeModello", "Revisione", "DataRevisione", "LivelloDiProgettazione"
+]
+
+# Value constraints of the project-level keys (STEP 4f), see value_rules.py for the syntax
+PROJECT_VALUE_CHECKS = {
+    "DataRevisione": "data",
+}
+
+# Parameters every element with a NomeOggetto must carry (STEP 4c)
+FIXED_ELEMENT_CHECKS = [
+    # (parameter name, pset name[, value constraint]), e.g.
+    # ("FaseProgetto", "Identità", "lista: PFTE; PD; PE") also checks the value (STEP 4f)
+    ("NomeOpera", "Identità"),
+    ("ParteOpera", "Identità"),
+    ("NomeOggetto", "Identità"),
+    ("GUID", "Identità"),
+    ("Disciplina", "Identità"),
+    ("Tipologia", "Identità"),
+    ("WBS7OperaPrincipale", "Identità"),
+    ("WBS8TrattoOpera", "Identità"),
+    ("WBS9ParteOpera", "Identità"),
+    ("CodiceIdentità", "Identità"),
+    ("FaseProgetto", "Identità"),
+    ("PrezzarioDiRiferimento", "Informazioni costi"),
+    ("IDCronoprogramma", "Informazioni tempi")
+]
+
+# Rules of one NomeOggetto class.
+#   required: (pset, parameter) pairs from the Excel, in workbook order
+#   required_set: the same pairs as a frozenset, for the STEP 4 difference
+#   allowed: Excel pairs plus the fixed pairs, for the STEP 4d difference
+#   values: ((pset, parameter), ValueRule) constraints from the Excel, in workbook order
+ObjectRules = namedtuple('ObjectRules', ['required', 'required_set', 'allowed', 'values'])
+
+# Everything the element checks need, compiled once per requirements workbook.
+#   objects: {NomeOggetto: ObjectRules}
+#   fixed / fixed_set: the fixed (pset, parameter) pairs of STEP 4c
+#   allowed_psets: every Pset named by the Excel or the fixed checks (STEP 4e)
+#   fixed_values: ((pset, parameter), ValueRule) constraints of the fixed checks
+#   project_values: (key, ValueRule) constraints of the project-level Pset
+RuleSet = namedtuple('RuleSet', ['objects', 'fixed', 'fixed_set', 'allowed_psets', 'fixed_values',
+                                 'project_values'])
+
+
+def _unique(pairs):
+    # Drop repeated pairs but keep the first-seen order for the report
+    return tuple(dict.fromkeys(pairs))
+
+
+def compile_rules(required_data, fixed_element_checks=FIXED_ELEMENT_CHECKS,
+                  project_value_checks=PROJECT_VALUE_CHECKS):
+    """Compile the Excel requirements and the fixed checks into a RuleSet.
+
+    `required_data` is the {Elemento: [{'parameter', 'pset'[, 'constraint']},
+    ...]} mapping of the requirements workbook. Repeated rows collapse into
+    one rule. Every distinct value constraint is compiled once (see
+    value_rules.compile_constraint) and shared by all the rules that use it;
+    an invalid one raises ValueError.
+    """
+    compiled = {}
+
+    def value_rule(text):
+        if text not in compiled:
+            compiled[text] = compile_constraint(text)
+        return compiled[text]
+
+    fixed = _unique((pset, param) for param, pset, *_ in fixed_element_checks)
+    fixed_set = frozenset(fixed)
+    fixed_values = tuple(((pset, param), value_rule(text))
+                         for pset, param, text in _unique((pset, param, constraint[0])
+                                                          for param, pset, *constraint in fixed_element_checks
+                                                          if constraint))
+
+    objects = {}
+    for nome_oggetto, items in required_data.items():
+        required = _unique((item['pset'], item['parameter']) for item in items)
+        required_set = frozenset(required)
+        values = tuple(((pset, param), value_rule(text))
+                       for pset, param, text in _unique((item['pset'], item['parameter'], item['constraint'])
+                                                        for item in items if item.get('constraint')))
+        objects[nome_oggetto] = ObjectRules(required, required_set, required_set | fixed_set, values)
+
+    allowed_psets = frozenset(pset for rules in objects.values() for pset, _ in rules.required) | \
+        frozenset(pset for pset, _ in fixed)
+    project_values = tuple((key, value_rule(text)) for key, text in project_value_checks.items())
+
+    return RuleSet(objects, fixed, fixed_set, allowed_psets, fixed_values, project_values)
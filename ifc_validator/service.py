@@ -0,0 +1,303 @@
+import json
+import os
+import socketserver
+import stat
+import sys
+import tempfile
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from . import model_cache
+from .metrics import Metrics
+from .reports import REPORT_SHEETS, save_report, summarize
+from .requirements import load_requirements
+from .rules import compile_rules
+from .validation import CHECK_ENGINES, EXTRACTION_MODES, check_model
+
+DEFAULT_PORT = 8765
+DEFAULT_MEMORY_BUDGET = 1024 ** 3  # Bytes of extracted models and rule sets kept in memory
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+def estimate_size(value):
+    """Approximate deep size of a value in bytes, counting shared objects once.
+
+    Enough to budget the cached models, whose property dicts are shared
+    between the elements of a Pset.
+    """
+    seen = set()
+    size = 0
+    stack = [value]
+    while stack:
+        item = stack.pop()
+        if id(item) in seen:
+            continue
+        seen.add(id(item))
+        size += sys.getsizeof(item)
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset)):
+            stack.extend(item)
+    return size
+
+
+class LRUCache:
+    """Thread-safe LRU cache bounded by the estimated size of its values.
+
+    get() loads a missing value once even when several threads ask for it at
+    the same time; the others wait for that load. The value just loaded is
+    always kept, even if it alone exceeds max_bytes.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key: (value, size)
+        self._lock = threading.Lock()
+        self._loading = {}  # key: lock held while the value is loaded
+
+    def get(self, key, load):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][0]
+            key_lock = self._loading.setdefault(key, threading.Lock())
+
+        with key_lock:
+            with self._lock:
+                if key in self._entries:  # Loaded by another thread meanwhile
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return self._entries[key][0]
+            try:
+                value = load()
+                size = estimate_size(value)
+            except BaseException:
+                with self._lock:
+                    self._loading.pop(key, None)
+                raise
+
+            # Stored and no longer loading at once: a thread in between would load the key again
+            with self._lock:
+                self._loading.pop(key, None)
+                self.misses += 1
+                if key in self._entries:
+                    self.bytes -= self._entries.pop(key)[1]
+                self._entries[key] = (value, size)
+                self.bytes += size
+                while self.bytes > self.max_bytes and len(self._entries) > 1:
+                    _, (_, evicted_size) = self._entries.popitem(last=False)
+                    self.bytes -= evicted_size
+            return value
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': self.bytes, 'max_bytes': self.max_bytes,
+                    'hits': self.hits, 'misses': self.misses}
+
+
+def _file_key(path, *extra):
+    # Identifies the current content of a file without reading it
+    stat = os.stat(path)
+    return (os.path.abspath(path), stat.st_size, stat.st_mtime_ns) + extra
+
+
+class ValidationService:
+    """Validates IFC files like app2.py, keeping extracted models and rule sets warm.
+
+    Models and compiled requirements share one memory budget: models get
+    what the requirement sets (small in comparison) leave. With a cache_dir
+    a model missing from memory is read from the on-disk model cache before
+    falling back to parsing the IFC file.
+    """
+
+    def __init__(self, memory_budget=DEFAULT_MEMORY_BUDGET, max_jobs=None, cache_dir=None):
+        self.rules = LRUCache(memory_budget // 16)
+        self.models = LRUCache(memory_budget - self.rules.max_bytes)
+        self.cache_dir = cache_dir
+        self.max_jobs = max_jobs or os.cpu_count() or 1
+        self._jobs = threading.BoundedSemaphore(self.max_jobs)
+        self._active = 0
+        self._active_lock = threading.Lock()
+
+    def load_rules(self, excel_file):
+        return self.rules.get(_file_key(excel_file), lambda: compile_rules(load_requirements(excel_file)))
+
+    def load_model(self, ifc_file_path, extraction_mode='relations'):
+        def load():
+            if self.cache_dir is None:
+                return model_cache.index_model(ifc_file_path, extraction_mode=extraction_mode)
+            return model_cache.load_model(ifc_file_path, self.cache_dir, extraction_mode=extraction_mode)
+        return self.models.get(_file_key(ifc_file_path, extraction_mode), load)
+
+    def validate(self, ifc_file_path, excel_file, extraction_mode='relations', engine='index'):
+        """Return (results, metrics) of the app2.py checks; at most max_jobs run at once."""
+        with self._jobs:
+            with self._active_lock:
+                self._active += 1
+            try:
+                metrics = Metrics()
+                with metrics.stage('STEP 1'):
+                    rules = self.load_rules(excel_file)
+                with metrics.stage('STEP 3 load') as counters:
+                    model = self.load_model(ifc_file_path, extraction_mode)
+                    counters['elements'] = model['element_count']
+                return check_model(model, rules, engine=engine, metrics=metrics), metrics
+            finally:
+                with self._active_lock:
+                    self._active -= 1
+
+    def status(self):
+        return {'models': self.models.stats(), 'rules': self.rules.stats(),
+                'active_jobs': self._active, 'max_jobs': self.max_jobs}
+
+
+class BadRequest(ValueError):
+    pass
+
+
+def _parse_job(body):
+    try:
+        job = json.loads(body or b'{}')
+    except ValueError as exc:
+        raise BadRequest(f"invalid JSON: {exc}")
+    if not isinstance(job, dict):
+        raise BadRequest("expected a JSON object")
+    for field in ('ifc_file', 'requirements'):
+        if not isinstance(job.get(field), str):
+            raise BadRequest(f"'{field}' (a path on this machine) is required")
+    if job.setdefault('format', 'json') not in ('json', 'xlsx'):
+        raise BadRequest("'format' must be 'json' or 'xlsx'")
+    if job.setdefault('extraction_mode', 'relations') not in EXTRACTION_MODES:
+        raise BadRequest(f"'extraction_mode' must be one of {sorted(EXTRACTION_MODES)}")
+    if job.setdefault('engine', 'index') not in CHECK_ENGINES:
+        raise BadRequest(f"'engine' must be one of {sorted(CHECK_ENGINES)}")
+    return job
+
+
+def _xlsx_report(results, ifc_file_path):
+    fd, path = tempfile.mkstemp(suffix='.xlsx')
+    os.close(fd)
+    try:
+        save_report(results, path, ifc_file_path)
+        with open(path, 'rb') as f:
+            return f.read()
+    finally:
+        os.remove(path)
+
+
+class ValidationHandler(BaseHTTPRequestHandler):
+    """HTTP API of a ValidationService (set as `service` on the server).
+
+    GET  /health    cache and job status
+    POST /validate  {"ifc_file": ..., "requirements": ..., "format": "json"|"xlsx",
+                     "extraction_mode": ..., "engine": ...}
+    """
+
+    server_version = "IfcValidator/1.0"
+
+    def do_GET(self):
+        if self.path == '/health':
+            self._send_json(200, self.server.service.status())
+        else:
+            self._send_json(404, {'error': f"unknown path {self.path}"})
+
+    def do_POST(self):
+        if self.path != '/validate':
+            self._send_json(404, {'error': f"unknown path {self.path}"})
+            return
+        try:
+            job = _parse_job(self.rfile.read(int(self.headers.get('Content-Length') or 0)))
+            results, metrics = self.server.service.validate(
+                job['ifc_file'], job['requirements'], extraction_mode=job['extraction_mode'], engine=job['engine'])
+        except BadRequest as exc:
+            self._send_json(400, {'error': str(exc)})
+            return
+        except FileNotFoundError as exc:
+            self._send_json(404, {'error': f"{exc.filename}: not found"})
+            return
+        except Exception as exc:
+            self._send_json(500, {'error': f"{type(exc).__name__}: {exc}"})
+            return
+
+        if job['format'] == 'xlsx':
+            self._send(200, XLSX_CONTENT_TYPE, _xlsx_report(results, job['ifc_file']))
+            return
+        self._send_json(200, {
+            'ifc_file': job['ifc_file'],
+            'element_count': results['element_count'],
+            'counts': {sheet_name: len(results[key]) for key, sheet_name in REPORT_SHEETS},
+            'summary': summarize(results)['groups'],
+            **{key: list(results[key]) for key, _ in REPORT_SHEETS},
+            'metrics': metrics.to_dict(),
+        })
+
+    def _send_json(self, status, payload):
+        self._send(status, 'application/json', json.dumps(payload, ensure_ascii=False).encode('utf-8'))
+
+    def _send(self, status, content_type, body):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def address_string(self):
+        # Unix socket clients have no (host, port) address
+        return self.client_address[0] if isinstance(self.client_address, tuple) else 'local'
+
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def _is_socket(path):
+    try:
+        return stat.S_ISSOCK(os.lstat(path).st_mode)
+    except FileNotFoundError:
+        return False
+
+
+def make_server(service, host='127.0.0.1', port=DEFAULT_PORT, unix_socket=None):
+    """Create the HTTP server of a service on a TCP port or, if given, a Unix socket.
+
+    A stale socket left at `unix_socket` by an earlier run is replaced; any
+    other file there raises FileExistsError.
+    """
+    if unix_socket is not None:
+        if _is_socket(unix_socket):
+            os.remove(unix_socket)
+        elif os.path.lexists(unix_socket):
+            raise FileExistsError(f"{unix_socket} exists and is not a socket")
+        server = UnixHTTPServer(unix_socket, ValidationHandler)
+    else:
+        server = ThreadingHTTPServer((host, port), ValidationHandler)
+    server.service = service
+    return server
+
+
+def run(args):
+    """The `serve` command, until interrupted; see cli.py for its arguments."""
+    memory_budget = args.memory_budget_mb * 1024 ** 2 if args.memory_budget_mb else DEFAULT_MEMORY_BUDGET
+    port = args.port or DEFAULT_PORT
+    service = ValidationService(memory_budget, max_jobs=args.jobs, cache_dir=args.cache_dir)
+    try:
+        server = make_server(service, args.host, port, args.unix_socket)
+    except FileExistsError as exc:
+        raise SystemExit(f"error: {exc}")
+    print(f"Serving on {args.unix_socket or f'http://{args.host}:{port}'}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if args.unix_socket is not None and _is_socket(args.unix_socket):
+            os.remove(args.unix_socket)
+
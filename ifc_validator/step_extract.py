@@ -0,0 +1,397 @@
+import mmap
+import re
+from array import array
+from bisect import bisect_left
+
+import ifcopenshell
+
+from .property_index import _attach
+
+# Entity classes the extractor reads; each stands for itself and its subtypes
+ELEMENT = 'IfcElement'
+PROJECT = 'IfcProject'
+PROPERTY_SET = 'IfcPropertySet'
+SINGLE_VALUE = 'IfcPropertySingleValue'
+TYPE_OBJECT = 'IfcTypeObject'
+DEFINES_BY_PROPERTIES = 'IfcRelDefinesByProperties'
+DEFINES_BY_TYPE = 'IfcRelDefinesByType'
+SCANNED = (ELEMENT, PROJECT, PROPERTY_SET, SINGLE_VALUE, TYPE_OBJECT, DEFINES_BY_PROPERTIES, DEFINES_BY_TYPE)
+
+_SCHEMA = re.compile(rb"FILE_SCHEMA\s*\(\s*\(\s*'([^']*)'")
+
+# A single value of a parameter list; strings are matched whole, '' escapes included
+_STRING = rb"'[^']*(?:''[^']*)*'"
+_SCALAR = rb"""
+    (?P<string>""" + _STRING + rb""")
+  | \#(?P<ref>[0-9]+)
+  | \.(?P<enum>[A-Z0-9_]+)\.
+  | (?P<number>[+-]?[0-9]+(?P<real>\.[0-9]*)?(?:[Ee][+-]?[0-9]+)?)
+  | "(?P<binary>[0-9A-F]*)"
+  | (?P<null>[$*])"""
+
+# One token of a parameter list. Values never are empty, so commas are
+# skipped along with the whitespace.
+_TOKEN = re.compile(rb"[\s,]*(?:" + _SCALAR + rb"""
+  | (?P<refs>\(\s*\#[0-9]+(?:[\s,]*\#[0-9]+)*\s*\))
+  | (?P<typed>[A-Z_][A-Z0-9_]*)\s*\(
+  | (?P<open>\()
+  | (?P<close>\)))""", re.X)
+
+_REF = re.compile(rb"#([0-9]+)")
+
+# The first parameter (GlobalId of a rooted entity), when it is a string
+_FIRST_STRING = re.compile(rb"\(\s*(" + _STRING + rb")")
+
+# Fast path for the bulk of a model's property data: the parameters of an
+# IfcPropertySingleValue (Name, Description, NominalValue, ...) up to its
+# NominalValue, when that is $ or a typed scalar like IFCLABEL('x')
+_SINGLE_VALUE = re.compile(rb"\(\s*(?P<name>" + _STRING + rb")\s*,\s*(?:" + _STRING + rb"|\$)\s*,\s*(?:\$|"
+                           rb"(?P<type>[A-Z_][A-Z0-9_]*)\s*\(\s*(?:" + _SCALAR + rb")\s*\))\s*[,)]", re.X)
+
+# Control directives of STEP strings (ISO 10303-21, 6.4.3)
+_ESCAPE = re.compile(r"''|\\\\|\\X2\\((?:[0-9A-F]{4})*)\\X0\\|\\X4\\((?:[0-9A-F]{8})*)\\X0\\"
+                     r"|\\X\\([0-9A-F]{2})|\\S\\(.)|\\P[A-I]\\", re.S)
+
+
+class Ref(int):
+    """An entity reference (#id) in a parameter list."""
+
+
+class Enum(str):
+    """An enumeration value (.VALUE.) in a parameter list, without the dots."""
+
+
+class Typed(tuple):
+    """A typed parameter such as IFCLABEL('x'): (type name, parameter list)."""
+
+
+def _unescape(match):
+    text = match.group()
+    if text == "''":
+        return "'"
+    if text == "\\\\":
+        return "\\"
+    if match.group(1) is not None:
+        return bytes.fromhex(match.group(1)).decode('utf-16-be')
+    if match.group(2) is not None:
+        return bytes.fromhex(match.group(2)).decode('utf-32-be')
+    if match.group(3) is not None:
+        return chr(int(match.group(3), 16))
+    if match.group(4) is not None:
+        return chr(ord(match.group(4)) + 128)
+    return ''  # \P?\ code page switch
+
+
+def decode_string(raw):
+    """The text of a STEP string literal, given its bytes between the quotes."""
+    # Outside the escapes STEP strings are ASCII; like ifcopenshell, other bytes are dropped
+    text = raw.decode('ascii', errors='ignore')
+    if "'" in text or '\\' in text:
+        text = _ESCAPE.sub(_unescape, text)
+    return text
+
+
+def parse_parameters(buffer, offset):
+    """Parse the parameter list that opens at buffer[offset] ('(').
+
+    Returns the list of values: str, int, float, None ($ and *), Ref, Enum,
+    Typed and nested lists. Only the bytes of this one list are read.
+    """
+    stack = []
+    name, values = None, None
+    expected = offset
+    for match in _TOKEN.finditer(buffer, offset):
+        if match.start() != expected:
+            break
+        expected = match.end()
+        kind = match.lastgroup
+        if kind in ('open', 'typed'):
+            stack.append((name, values))
+            name, values = (match.group('typed').decode('ascii') if kind == 'typed' else None), []
+            continue
+        if kind == 'close':
+            value = Typed((name, values)) if name is not None else values
+            name, values = stack.pop()
+            if values is None:
+                return value
+        elif kind == 'refs':  # Lists of references, e.g. RelatedObjects, in one step
+            value = [Ref(ref) for ref in _REF.findall(match.group('refs'))]
+        else:
+            value = _scalar(match, kind)
+        values.append(value)
+    raise ValueError(f"Unreadable STEP parameters at byte {expected}")
+
+
+def _scalar(match, kind):
+    # Python value of a _SCALAR match whose `kind` group matched
+    if kind == 'string':
+        return decode_string(match.group('string')[1:-1])
+    if kind == 'ref':
+        return Ref(match.group('ref'))
+    if kind == 'enum':
+        return Enum(match.group('enum').decode('ascii'))
+    if kind == 'number':
+        text = match.group('number')
+        return float(text) if match.group('real') is not None or b'E' in text.upper() else int(text)
+    if kind == 'binary':
+        return match.group('binary').decode('ascii')
+    return None
+
+
+def _logical(value):
+    return {'T': True, 'F': False}.get(value, 'UNKNOWN')
+
+
+def _converter(parameter_type):
+    # Python conversion of a value of a schema type, like ifcopenshell's wrappedValue
+    wrapper = ifcopenshell.ifcopenshell_wrapper
+    if isinstance(parameter_type, wrapper.named_type):
+        declaration = parameter_type.declared_type()
+        if isinstance(declaration, wrapper.type_declaration):
+            return _converter(declaration.declared_type())
+        return lambda value: value
+    if isinstance(parameter_type, wrapper.aggregation_type):
+        convert = _converter(parameter_type.type_of_element())
+        return lambda value: tuple(convert(item) for item in value)
+    kind = parameter_type.declared_type() if isinstance(parameter_type, wrapper.simple_type) else None
+    if kind in ('real', 'number'):
+        return float
+    if kind == 'integer':
+        return int
+    if kind in ('boolean', 'logical'):
+        return _logical
+    return lambda value: value
+
+
+class StepSchema:
+    """What the extractor needs from the file's IFC schema, taken from ifcopenshell's schema definitions."""
+
+    def __init__(self, name):
+        try:
+            self.schema = ifcopenshell.ifcopenshell_wrapper.schema_by_name(name)
+        except RuntimeError as exc:
+            raise ValueError(f"Unsupported IFC schema: {name}") from exc
+        self._converters = {}
+
+    def subtypes(self, entity):
+        """Upper-case names of an entity class and all its subtypes, in ifcopenshell's by_type order."""
+        names = []
+
+        def walk(declaration):
+            names.append(declaration.name().upper())
+            for subtype in declaration.subtypes():
+                walk(subtype)
+
+        walk(self.schema.declaration_by_name(entity))
+        return names
+
+    def attribute(self, entity, attribute):
+        """Position of an attribute in the parameter list of an entity class."""
+        names = [item.name() for item in self.schema.declaration_by_name(entity).all_attributes()]
+        return names.index(attribute)
+
+    def value(self, type_name, value):
+        """Plain Python value of a typed parameter such as IFCLABEL('x'), like ifcopenshell's wrappedValue."""
+        convert = self._converters.get(type_name)
+        if convert is None:
+            try:
+                declaration = self.schema.declaration_by_name(type_name)
+                convert = _converter(declaration.declared_type())
+            except RuntimeError:  # Not a defined type of this schema: keep the raw value
+                convert = lambda value: value
+            self._converters[type_name] = convert
+        return convert(value)
+
+
+class StepIndex:
+    """Byte offsets of the entity instances of the SCANNED classes in a STEP buffer.
+
+    The index is three parallel typed arrays sorted by entity id (ids,
+    offsets of the '(' opening the parameters, class codes), looked up with
+    bisect, so it costs a few bytes per scanned entity. Instances of other
+    classes (geometry, placements, ...) are skipped by the scan and never
+    parsed.
+    """
+
+    def __init__(self, buffer, schema):
+        self.buffer = buffer
+        self.schema = schema
+        # Class codes follow by_type order within each SCANNED class
+        self.groups = {}  # SCANNED class -> set of class codes
+        codes = {}
+        for group in SCANNED:
+            for name in schema.subtypes(group):
+                codes.setdefault(name.encode('ascii'), len(codes))
+            self.groups[group] = {codes[name.encode('ascii')] for name in schema.subtypes(group)}
+
+        # The alternatives are followed by '(', so IFCWALL does not match IFCWALLSTANDARDCASE
+        pattern = re.compile(rb"#([0-9]+)\s*=\s*(" + b"|".join(codes) + rb")\s*\(")
+        self.ids = array('q')
+        self.offsets = array('q')
+        self.codes = array('H')
+        for match in pattern.finditer(buffer):
+            self.ids.append(int(match.group(1)))
+            self.offsets.append(match.end() - 1)
+            self.codes.append(codes[match.group(2)])
+        if any(a > b for a, b in zip(self.ids, self.ids[1:])):  # Exporters usually write ids in order
+            order = sorted(range(len(self.ids)), key=self.ids.__getitem__)
+            self.ids, self.offsets, self.codes = (array(column.typecode, (column[i] for i in order))
+                                                  for column in (self.ids, self.offsets, self.codes))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def find(self, entity_id):
+        """Position of an entity id in the index, or -1 when it is not a scanned instance."""
+        position = bisect_left(self.ids, entity_id)
+        if position < len(self.ids) and self.ids[position] == entity_id:
+            return position
+        return -1
+
+    def is_a(self, position, group):
+        return position >= 0 and self.codes[position] in self.groups[group]
+
+    def parameters(self, position):
+        return parse_parameters(self.buffer, self.offsets[position])
+
+    def global_id(self, position):
+        match = _FIRST_STRING.match(self.buffer, self.offsets[position])
+        return decode_string(match.group(1)[1:-1]) if match is not None else self.parameters(position)[0]
+
+    def instances(self, group):
+        """Positions of the instances of a SCANNED class, in ifcopenshell's by_type order."""
+        codes = self.groups[group]
+        positions = [position for position, code in enumerate(self.codes) if code in codes]
+        return sorted(positions, key=lambda position: self.codes[position])  # Stable: ids stay sorted
+
+
+def _single_value(index, position, attributes):
+    # (Name, plain NominalValue or None) of an IfcPropertySingleValue
+    match = _SINGLE_VALUE.match(index.buffer, index.offsets[position])
+    if match is not None:
+        name = decode_string(match.group('name')[1:-1])
+        if match.group('type') is None:
+            return name, None
+        return name, index.schema.value(match.group('type').decode('ascii'), _scalar(match, match.lastgroup))
+    prop = index.parameters(position)
+    name, value = prop[attributes['prop_name']], prop[attributes['nominal_value']]
+    if isinstance(value, Typed):
+        type_name, (value,) = value
+        value = index.schema.value(type_name, value)
+    return name, value
+
+
+def _decode_pset(index, position, attributes):
+    # The Pset's name and the same (props, nome_oggetto, guid) triple as property_index.decode_pset
+    parameters = index.parameters(position)
+    props = {}
+    nome_oggetto = guid = (False, None)
+    for ref in parameters[attributes['has_properties']] or ():
+        prop_position = index.find(ref) if isinstance(ref, Ref) else -1
+        if not index.is_a(prop_position, SINGLE_VALUE):
+            continue
+        name, value = _single_value(index, prop_position, attributes)
+        if name is None or value is None:
+            continue
+        props[name] = value
+        if name == 'NomeOggetto' and not nome_oggetto[0]:
+            nome_oggetto = (True, value)
+        elif name == 'GUID' and not guid[0]:
+            guid = (True, value)
+    return parameters[attributes['pset_name']], (props, nome_oggetto, guid)
+
+
+def index_step_file(ifc_file_path, counters=None):
+    """Extract a model straight from the STEP text of an .ifc file, without ifcopenshell.open.
+
+    Returns the same {'element_count', 'property_index', 'project_psets'} as
+    model_cache.index_model in 'relations' mode, elements in
+    by_type("IfcElement") order and type Psets included, and can be used to
+    cross-check it. The file is memory-mapped and only the entity instances
+    of the SCANNED classes are indexed (see StepIndex); property sets and
+    values are parsed when a relation reaches them, each once, so time and
+    memory follow the property data rather than the geometry. ifcopenshell
+    only provides the schema. `counters` (a Counter), when given, receives
+    the instances indexed, elements scanned, relations visited, Psets
+    decoded and properties read.
+    """
+    with open(ifc_file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+        header = _SCHEMA.search(buffer, 0, 1 << 16)
+        if header is None:
+            raise ValueError(f"No FILE_SCHEMA in the header of {ifc_file_path}")
+        schema = StepSchema(header.group(1).decode('ascii'))
+        index = StepIndex(buffer, schema)
+        attributes = {
+            'pset_name': schema.attribute(PROPERTY_SET, 'Name'),
+            'has_properties': schema.attribute(PROPERTY_SET, 'HasProperties'),
+            'prop_name': schema.attribute(SINGLE_VALUE, 'Name'),
+            'nominal_value': schema.attribute(SINGLE_VALUE, 'NominalValue'),
+            'has_property_sets': schema.attribute(TYPE_OBJECT, 'HasPropertySets'),
+            'related_objects': schema.attribute(DEFINES_BY_PROPERTIES, 'RelatedObjects'),
+            'relating_definition': schema.attribute(DEFINES_BY_PROPERTIES, 'RelatingPropertyDefinition'),
+            'typed_objects': schema.attribute(DEFINES_BY_TYPE, 'RelatedObjects'),
+            'relating_type': schema.attribute(DEFINES_BY_TYPE, 'RelatingType'),
+        }
+
+        property_index = {}
+        for position in index.instances(ELEMENT):
+            property_index[index.ids[position]] = {
+                'psets': {}, 'nome_oggetto': None, 'guid': None,
+                'global_id': index.global_id(position),
+            }
+        projects = {index.ids[position]: {} for position in index.instances(PROJECT)}
+        found = set()
+        decoded = {}
+
+        def decode(pset_position):
+            if pset_position not in decoded:
+                decoded[pset_position] = _decode_pset(index, pset_position, attributes)
+            return decoded[pset_position]
+
+        # Same two passes as property_index.index_by_relations
+        relations = index.instances(DEFINES_BY_PROPERTIES)
+        for position in relations:
+            parameters = index.parameters(position)
+            definition = parameters[attributes['relating_definition']]
+            pset_position = index.find(definition) if isinstance(definition, Ref) else -1
+            if not index.is_a(pset_position, PROPERTY_SET):
+                continue
+            related = parameters[attributes['related_objects']] or ()
+            targets = [property_index[ref] for ref in related if ref in property_index]
+            project_targets = [projects[ref] for ref in related if ref in projects]
+            if not targets and not project_targets:
+                continue
+            pset_name, decoded_pset = decode(pset_position)
+            for record in targets:
+                _attach(record, pset_name, decoded_pset, found)
+            for psets in project_targets:
+                # extract_psets merges same-named Psets property by property
+                if decoded_pset[0]:
+                    psets.setdefault(pset_name, {}).update(decoded_pset[0])
+
+        type_relations = index.instances(DEFINES_BY_TYPE)
+        for position in type_relations:
+            parameters = index.parameters(position)
+            targets = [property_index[ref] for ref in parameters[attributes['typed_objects']] or ()
+                       if ref in property_index]
+            type_position = index.find(parameters[attributes['relating_type']])
+            if not targets or not index.is_a(type_position, TYPE_OBJECT):
+                continue
+            for ref in index.parameters(type_position)[attributes['has_property_sets']] or ():
+                pset_position = index.find(ref) if isinstance(ref, Ref) else -1
+                if index.is_a(pset_position, PROPERTY_SET):
+                    pset_name, decoded_pset = decode(pset_position)
+                    for record in targets:
+                        _attach(record, pset_name, decoded_pset, found, inherited=True)
+
+    if counters is not None:
+        counters['instances_indexed'] += len(index)
+        counters['elements_scanned'] += len(property_index)
+        counters['relations_visited'] += len(relations) + len(type_relations)
+        counters['psets_decoded'] += len(decoded)
+        counters['properties_read'] += sum(len(props) for _, (props, _, _) in decoded.values())
+    return {
+        'element_count': len(property_index),
+        'property_index': property_index,
+        'project_psets': list(projects.values()),
+    }
@@ -0,0 +1,346 @@
+import multiprocessing
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import ifcopenshell
+
+from . import model_cache
+from .issues import IssueList, IssueStore
+from .metrics import Metrics, peak_rss_mb
+from .property_index import build_property_index, extract_project_psets, select_elements, split_relations
+from .rules import PROJECT_KEYS, PROJECT_PSET
+
+
+# === STEP 4b: Check Project-Level Pset ===
+
+def check_project(project_psets):
+    """Report missing keys of the project-level Pset.
+
+    `project_psets` holds one {pset: {prop: value}} per IfcProject, as
+    returned by extract_project_psets().
+    """
+    project_level_issues = []
+
+    for psets in project_psets:
+        for key in PROJECT_KEYS:
+            if PROJECT_PSET not in psets or key not in psets[PROJECT_PSET]:
+                project_level_issues.append({'Missing Parameter': key, 'Pset': PROJECT_PSET})
+    return project_level_issues
+
+
+# === STEP 4f: Check Project-Level Values ===
+
+def check_project_values(project_psets, rules):
+    """Report project-level values that break their constraint (rules.project_values).
+
+    Missing keys are left to check_project.
+    """
+    project_value_issues = []
+
+    for psets in project_psets:
+        props = psets.get(PROJECT_PSET, {})
+        for key, value_rule in rules.project_values:
+            if key in props and value_rule.rejected([props[key]]):
+                project_value_issues.append({'Invalid Parameter': key, 'Pset': PROJECT_PSET, 'Value': props[key],
+                                             'Constraint': value_rule.text})
+    return project_value_issues
+
+
+# === STEP 4 to 4f: Validate Each Element ===
+
+def check_elements(property_index, rules):
+    """Run the element-level checks on indexed elements in a single pass.
+
+    Every check is one set difference between the element's (pset, parameter)
+    pairs and the compiled RuleSet (see rules.compile_rules):
+      STEP 4   Excel pairs of its NomeOggetto the element lacks
+      STEP 4c  fixed pairs the element lacks
+      STEP 4d  pairs neither the Excel (for its NomeOggetto) nor the fixed checks allow
+      STEP 4e  Psets no rule mentions at all
+    STEP 4f then checks the values of the constrained pairs (the Excel ones of
+    the element's NomeOggetto, then the fixed ones) the element has. The
+    values are gathered into one column per compiled ValueRule during the
+    pass and each column is checked in a single batch, so a value shared by
+    many elements is checked once (see ValueRule.rejected).
+    Only elements with a NomeOggetto are checked, and STEP 4/4d only when the
+    Excel has rules for it. Issues are listed in rule order (STEP 4/4c/4f) or
+    in the element's property order (STEP 4d/4e). The STEP 4 and 4c issues are
+    kept apart so that results of several shards can be concatenated per key
+    and still match the serial order. The issues of the five lists are
+    interned into one IssueStore (see issues.py).
+    """
+    store = IssueStore()
+    required_report = IssueList('missing', store)
+    fixed_report = IssueList('missing', store)
+    unexpected_report = IssueList('unexpected_parameter', store)
+    unexpected_pset_report = IssueList('unexpected_pset', store)
+    invalid_value_report = IssueList('invalid_value', store)
+    # {ValueRule: ([(element seq, rule order, element code, pset, parameter)], [value])}
+    value_batches = {}
+
+    for seq, record in enumerate(property_index.values()):
+        nome_oggetto = record['nome_oggetto']
+        if nome_oggetto is None:
+            continue
+
+        actual_psets = record['psets']
+        present = [(pset_name, prop_name) for pset_name, props in actual_psets.items() for prop_name in props]
+        present_set = frozenset(present)
+        object_rules = rules.objects.get(nome_oggetto)
+        element = store.element(record['guid'], nome_oggetto)
+
+        if object_rules is not None:
+            missing = object_rules.required_set - present_set
+            if missing:
+                for pair in object_rules.required:
+                    if pair in missing:
+                        required_report.append(element, pair[0], pair[1])
+
+        missing = rules.fixed_set - present_set
+        if missing:
+            for pair in rules.fixed:
+                if pair in missing:
+                    fixed_report.append(element, pair[0], pair[1])
+
+        if object_rules is not None:
+            unexpected = present_set - object_rules.allowed
+            if unexpected:
+                for pair in present:
+                    if pair in unexpected:
+                        unexpected_report.append(element, pair[0], pair[1])
+
+        unexpected = actual_psets.keys() - rules.allowed_psets
+        if unexpected:
+            for pset_name in actual_psets:
+                if pset_name in unexpected:
+                    unexpected_pset_report.append(element, pset_name)
+
+        value_checks = object_rules.values + rules.fixed_values if object_rules is not None else rules.fixed_values
+        for order, (pair, value_rule) in enumerate(value_checks):
+            if pair in present_set:
+                rows, values = value_batches.setdefault(value_rule, ([], []))
+                rows.append((seq, order, element) + pair)
+                values.append(actual_psets[pair[0]][pair[1]])
+
+    # STEP 4f: one batch per rule, then back to element and rule order
+    invalid = []
+    for value_rule, (rows, values) in value_batches.items():
+        for position in value_rule.rejected(values):
+            invalid.append(rows[position] + (values[position], value_rule.text))
+    invalid.sort(key=lambda row: row[:2])
+    for _, _, element, pset_name, prop_name, value, constraint in invalid:
+        invalid_value_report.append(element, pset_name, prop_name, value, constraint)
+
+    return {
+        'required': required_report,
+        'fixed': fixed_report,
+        'unexpected_report': unexpected_report,
+        'unexpected_pset_report': unexpected_pset_report,
+        'invalid_value_report': invalid_value_report,
+    }
+
+
+def check_table(property_index, rules):
+    """property_table.check_table, importing pandas only when that engine is used."""
+    from .property_table import check_table
+    return check_table(property_index, rules)
+
+
+# How the properties are extracted, selected with validate_model(extraction_mode=...):
+# 'relations' and 'elements' are the two build_property_index modes over an
+# ifcopenshell model, 'step' scans the STEP text without one (step_extract.py)
+EXTRACTION_MODES = ('relations', 'elements', 'step')
+
+# Element-level check implementations, selected with validate_model(engine=...)
+CHECK_ENGINES = {
+    'index': check_elements,  # Python loop over the property index; the faster one
+    'table': check_table,  # pandas anti-joins over the property table; a cross-check of 'index'
+}
+
+
+# Parsed model and requirements, set by the parent before forking so the
+# shard workers inherit them copy-on-write instead of receiving a pickle
+_shard_state = None
+
+
+def _measured(function, *args, **kwargs):
+    # (result, wall seconds, CPU seconds) of one call
+    wall = time.perf_counter()
+    cpu = time.process_time()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - wall, time.process_time() - cpu
+
+
+def check_counters(property_index, checked):
+    """Counters of a check_elements() run, for the STEP 4-4f metrics stage."""
+    return {
+        'elements_checked': sum(1 for record in property_index.values() if record['nome_oggetto'] is not None),
+        'issues_step4': len(checked['required']),
+        'issues_step4c': len(checked['fixed']),
+        'issues_step4d': len(checked['unexpected_report']),
+        'issues_step4e': len(checked['unexpected_pset_report']),
+        'issues_step4f': len(checked['invalid_value_report']),
+    }
+
+
+def _check_shard(bounds):
+    ifc_file, elements, rules, extraction_mode, engine, selection, relations = _shard_state
+    start, stop = bounds
+    extract_counters = Counter()
+    property_index, extract_wall, extract_cpu = _measured(
+        build_property_index, ifc_file, elements[start:stop], mode=extraction_mode, counters=extract_counters,
+        relations=relations.get(bounds) if relations is not None else None)
+    property_index = select_elements(property_index, *selection)
+    checked, check_wall, check_cpu = _measured(CHECK_ENGINES[engine], property_index, rules)
+    measurements = {
+        'STEP 3 extract': (extract_wall, extract_cpu, extract_counters),
+        'STEP 4-4f': (check_wall, check_cpu, check_counters(property_index, checked)),
+    }
+    return checked, measurements, peak_rss_mb()
+
+
+def check_elements_sharded(ifc_file, elements, rules, workers, extraction_mode='relations', engine='index',
+                           metrics=None, nome_oggetti=None, guids=None):
+    """Split `elements` into contiguous shards and check them in forked workers.
+
+    Returns one check_elements() result per shard, in element order. Falls
+    back to a single shard where the 'fork' start method is unavailable
+    (Windows), since the parsed model cannot be shared otherwise, and when
+    there are no elements to split. The extraction and check times of all
+    shards are added to `metrics` (summed over the workers when sharded),
+    with the largest peak RSS a worker reported.
+    Only the elements selected by nome_oggetti and guids are checked (see
+    property_index.select_elements). In the 'relations' mode the parent
+    splits the model's relations between the shards before forking (see
+    property_index.split_relations), so each relation is walked once in
+    total rather than once per shard.
+    """
+    global _shard_state
+    _shard_state = (ifc_file, elements, rules, extraction_mode, engine, (nome_oggetti, guids), None)
+    try:
+        if workers <= 1 or not elements or 'fork' not in multiprocessing.get_all_start_methods():
+            shards = [_check_shard((0, len(elements)))]
+        else:
+            # A few shards per worker evens out NomeOggetto classes of different cost
+            shard_count = min(len(elements), workers * 4)
+            shard_size = -(-len(elements) // shard_count)
+            bounds = [(start, start + shard_size) for start in range(0, len(elements), shard_size)]
+            if extraction_mode == 'relations':
+                split_counters = Counter()
+                relations, split_wall, split_cpu = _measured(split_relations, ifc_file, elements, bounds,
+                                                             counters=split_counters)
+                _shard_state = _shard_state[:-1] + (relations,)
+                if metrics is not None:
+                    metrics.add('STEP 3 split', split_wall, split_cpu, split_counters)
+
+            wall = time.perf_counter()
+            cpu = time.process_time()
+            with ProcessPoolExecutor(max_workers=workers,
+                                     mp_context=multiprocessing.get_context('fork')) as executor:
+                shards = list(executor.map(_check_shard, bounds))
+            if metrics is not None:
+                # Wall time of the pool as a whole; the CPU time here is the parent's only
+                metrics.add('STEP 3-4f (sharded)', time.perf_counter() - wall, time.process_time() - cpu,
+                            {'workers': workers, 'shards': len(bounds)})
+    finally:
+        _shard_state = None
+
+    if metrics is not None:
+        # A single shard ran in this process, whose own peak is recorded anyway
+        worker_peak = max(peak for _, _, peak in shards) if len(shards) > 1 else None
+        for name in ('STEP 3 extract', 'STEP 4-4f'):
+            counters = Counter()
+            for _, measurements, _ in shards:
+                counters.update(measurements[name][2])
+            metrics.add(name, sum(measurements[name][0] for _, measurements, _ in shards),
+                        sum(measurements[name][1] for _, measurements, _ in shards), counters,
+                        worker_peak_rss_mb=worker_peak)
+    return [checked for checked, _, _ in shards]
+
+
+def validate_model(ifc_file_path, rules, extraction_mode='relations', workers=1, cache_dir=None, engine='index',
+                   metrics=None, nome_oggetti=None, guids=None):
+    """Run the app2.py checks (STEP 3 to 4e) on one IFC file against a compiled RuleSet.
+
+    With workers > 1 the element checks are sharded across forked processes
+    (see check_elements_sharded); the issue lists come out in the same order
+    as a serial run. With a cache_dir the extracted properties are read from
+    (or stored to) the model cache, and an unchanged file is not parsed at
+    all; see model_cache.load_model. The cached path always runs in this
+    process: `workers` is ignored with a cache_dir, also on a cache miss,
+    which extracts the whole model serially. extraction_mode='step' extracts the
+    properties without ifcopenshell (step_extract.index_step_file) and checks
+    them in this process, whatever `workers` is. engine picks the element
+    check implementation from CHECK_ENGINES; both give the same results, and
+    'index' is the faster one. Stage
+    timings and counters are recorded in `metrics` (a metrics.Metrics).
+
+    nome_oggetti and guids (collections of NomeOggetto and GUID property
+    values) restrict the element checks to the matching elements. With a
+    cache_dir they are looked up in the cache's indexes and only the matches
+    are loaded; otherwise the model is extracted and then filtered.
+
+    Returns a dict with the element count and the issue lists, keyed like
+    the variables of the scripts.
+    """
+    if metrics is None:
+        metrics = Metrics()
+
+    if cache_dir is not None:
+        with metrics.stage('STEP 3 load') as counters:
+            model = model_cache.load_model(ifc_file_path, cache_dir, extraction_mode=extraction_mode,
+                                           nome_oggetti=nome_oggetti, guids=guids)
+            counters['elements'] = model['element_count']
+        return check_model(model, rules, engine=engine, metrics=metrics)
+
+    if extraction_mode == 'step':
+        with metrics.stage('STEP 3 extract') as counters:
+            model = model_cache.index_model(ifc_file_path, extraction_mode='step', counters=counters)
+            counters['elements'] = model['element_count']
+        model['property_index'] = select_elements(model['property_index'], nome_oggetti, guids)
+        return check_model(model, rules, engine=engine, metrics=metrics)
+
+    with metrics.stage('STEP 3 load') as counters:
+        ifc_file = ifcopenshell.open(ifc_file_path)
+        elements = ifc_file.by_type("IfcElement")
+        counters['elements'] = len(elements)
+    shards = check_elements_sharded(ifc_file, elements, rules, workers, extraction_mode=extraction_mode,
+                                    engine=engine, metrics=metrics, nome_oggetti=nome_oggetti, guids=guids)
+    return _results(len(elements), shards, extract_project_psets(ifc_file), rules, metrics)
+
+
+def check_model(model, rules, engine='index', metrics=None):
+    """Run STEP 4 to 4f on an already extracted model (see model_cache.index_model).
+
+    Returns the same dict as validate_model. The model is only read, so one
+    loaded model can be checked against several rule sets.
+    """
+    if metrics is None:
+        metrics = Metrics()
+    with metrics.stage('STEP 4-4f') as counters:
+        checked = CHECK_ENGINES[engine](model['property_index'], rules)
+        counters.update(check_counters(model['property_index'], checked))
+    return _results(model['element_count'], [checked], model['project_psets'], rules, metrics)
+
+
+def _results(element_count, shards, project_psets, rules, metrics):
+    def merged(*keys):
+        return IssueList.concat(shard[key] for key in keys for shard in shards)
+
+    with metrics.stage('STEP 4b') as counters:
+        project_level_issues = check_project(project_psets)
+        counters['projects'] = len(project_psets)
+        counters['issues'] = len(project_level_issues)
+        project_value_issues = check_project_values(project_psets, rules)
+        counters['invalid_values'] = len(project_value_issues)
+
+    return {
+        'element_count': element_count,
+        'missing_report': merged('required', 'fixed'),
+        'project_level_issues': project_level_issues,
+        'unexpected_report': merged('unexpected_report'),
+        'unexpected_pset_report': merged('unexpected_pset_report'),
+        'invalid_value_report': merged('invalid_value_report'),
+        'project_value_issues': project_value_issues,
+    }
@@ -0,0 +1,129 @@
+import re
+from abc import ABC, abstractmethod
+from datetime import datetime
+
+# Value constraints, one per workbook cell or fixed check:
+#   data                    a date in one of DATE_FORMATS
+#   data: %d/%m/%Y; %Y      a date in one of these strptime formats
+#   lista: A; B; C          one of these values
+#   regex: WBS7-[0-9]{3}    the whole value matches the regular expression
+#   intervallo: 0..100      a number within the bounds; either bound may be left out
+# Values are compared as stripped text, except by intervallo.
+
+DATE_FORMATS = ('%Y-%m-%d', '%d/%m/%Y', '%Y-%m-%dT%H:%M:%S')
+
+
+def _text(value):
+    return str(value).strip()
+
+
+class ValueRule(ABC):
+    """A compiled value constraint; `text` is the constraint as written."""
+
+    def __init__(self, text):
+        self.text = text
+
+    @abstractmethod
+    def accepts(self, value):
+        """Whether a value (never None) satisfies the constraint."""
+
+    def rejected(self, values):
+        """Positions of the values the rule rejects.
+
+        `values` is a whole column (one value per element); every distinct
+        value is checked once, however many elements share it. A property
+        without a value (None) never satisfies a constraint.
+        """
+        verdicts = {}
+        for value in values:
+            key = (type(value), value)  # True, 1 and 1.0 are different values here
+            if key not in verdicts:
+                verdicts[key] = value is not None and self.accepts(value)
+        return [position for position, value in enumerate(values) if not verdicts[(type(value), value)]]
+
+    def __repr__(self):
+        return f"<{type(self).__name__} {self.text!r}>"
+
+
+class DateRule(ValueRule):
+    def __init__(self, text, formats=DATE_FORMATS):
+        super().__init__(text)
+        self.formats = tuple(formats)
+
+    def accepts(self, value):
+        if not isinstance(value, str):
+            return False
+        for date_format in self.formats:
+            try:
+                datetime.strptime(value.strip(), date_format)
+                return True
+            except ValueError:
+                pass
+        return False
+
+
+class ListRule(ValueRule):
+    def __init__(self, text, allowed):
+        super().__init__(text)
+        self.allowed = frozenset(allowed)
+
+    def accepts(self, value):
+        return _text(value) in self.allowed
+
+
+class RegexRule(ValueRule):
+    def __init__(self, text, pattern):
+        super().__init__(text)
+        try:
+            self.pattern = re.compile(pattern)
+        except re.error as exc:
+            raise ValueError(f"Invalid value constraint {text!r}: {exc}") from exc
+
+    def accepts(self, value):
+        return self.pattern.fullmatch(_text(value)) is not None
+
+
+class RangeRule(ValueRule):
+    def __init__(self, text, low, high):
+        super().__init__(text)
+        self.low = low
+        self.high = high
+
+    def accepts(self, value):
+        if isinstance(value, bool):
+            return False
+        if not isinstance(value, (int, float)):
+            try:
+                value = float(_text(value).replace(',', '.'))  # Decimal comma, as typed in Italian models
+            except ValueError:
+                return False
+        return (self.low is None or value >= self.low) and (self.high is None or value <= self.high)
+
+
+def _bound(text, constraint):
+    if not text.strip():
+        return None
+    try:
+        return float(text.replace(',', '.'))
+    except ValueError:
+        raise ValueError(f"Invalid value constraint {constraint!r}: {text.strip()!r} is not a number") from None
+
+
+def _items(argument):
+    return [item.strip() for item in argument.split(';') if item.strip()]
+
+
+def compile_constraint(text):
+    """Compile one constraint (see the syntax at the top of this module) into a ValueRule."""
+    kind, _, argument = text.partition(':')
+    kind = kind.strip().lower()
+    if kind == 'data':
+        return DateRule(text, _items(argument) or DATE_FORMATS)
+    if kind == 'lista' and _items(argument):
+        return ListRule(text, _items(argument))
+    if kind == 'regex' and argument.strip():
+        return RegexRule(text, argument.strip())
+    if kind == 'intervallo' and '..' in argument:
+        low, high = argument.split('..', 1)
+        return RangeRule(text, _bound(low, text), _bound(high, text))
+    raise ValueError(f"Invalid value constraint {text!r}: expected data, lista: ..., regex: ... or intervallo: a..b")